@@ -0,0 +1,310 @@
+"""
+A compact, array-backed graph used by the motif counting and randomization code.
+"""
+
+import numpy as np
+
+
+# The arrays that fully describe a compact graph (besides its size and directedness).
+COMPACT_GRAPH_ARRAYS = ("out_indptr", "out_indices", "in_indptr", "in_indices", "neighbor_indptr",
+                        "neighbor_indices", "out_reciprocal", "_keys", "_neighbor_keys")
+
+
+class CompactGraph(object):
+    """
+    An immutable graph stored as sorted int32 CSR (compressed sparse row) arrays.
+
+    Nodes are relabeled to the integers 0..n-1 (the original labels are kept in
+    `labels`). Every row of the out- and in-neighbor arrays is sorted, so an edge
+    lookup is a binary search over a single row. Self-loops and duplicate edges
+    carry no triad information and are dropped. For undirected graphs each edge is
+    stored in both directions, so the out- and in-neighbor arrays are identical.
+
+    Attributes:
+        num_nodes => The number of nodes in the graph.
+        directed => Whether or not the graph is directed.
+        labels => A list where index i holds the original label of node i.
+        out_indptr, out_indices => The CSR arrays of out-neighbors.
+        in_indptr, in_indices => The CSR arrays of in-neighbors.
+        neighbor_indptr, neighbor_indices => The CSR arrays of nodes linked in either
+        direction (identical to the out-neighbor arrays for undirected graphs).
+        out_reciprocal => A boolean array aligned with out_indices that is True
+        wherever the reverse arc also exists.
+    """
+
+    def __init__(self, num_nodes, sources, targets, directed=True, labels=None):
+        """
+        Builds the CSR arrays from arrays of integer node indices.
+
+        Arguments:
+            num_nodes => The number of nodes in the graph.
+            sources => An array of edge source node indices.
+            targets => An array of edge target node indices.
+            directed => Whether or not the graph is directed.
+            labels => The original node labels (defaults to the node indices).
+        """
+
+        self.num_nodes = int(num_nodes)
+        self.directed = bool(directed)
+        self.labels = list(labels) if labels is not None else list(range(self.num_nodes))
+
+        sources = np.asarray(sources, dtype=np.int64).ravel()
+        targets = np.asarray(targets, dtype=np.int64).ravel()
+
+        # Drop self-loops since they never take part in a triad.
+        keep = sources != targets
+        sources, targets = sources[keep], targets[keep]
+
+        # Undirected edges are stored in both directions.
+        if not self.directed:
+            sources, targets = np.concatenate((sources, targets)), np.concatenate((targets, sources))
+
+        # Encode every arc as a single integer key; sorting the unique keys sorts the
+        # arcs by source and then by target, which is exactly the CSR row order.
+        keys = np.unique(sources * self.num_nodes + targets)
+        self._keys = keys
+
+        out_sources = keys // self.num_nodes
+        out_targets = keys % self.num_nodes
+        self.out_indptr = self._build_indptr(out_sources)
+        self.out_indices = out_targets.astype(np.int32)
+
+        if self.directed:
+            in_order = np.lexsort((out_sources, out_targets))
+            self.in_indptr = self._build_indptr(out_targets[in_order])
+            self.in_indices = out_sources[in_order].astype(np.int32)
+
+            # The neighbors in either direction are the union of both arc orientations.
+            neighbor_keys = np.union1d(keys, out_targets * self.num_nodes + out_sources)
+            self._neighbor_keys = neighbor_keys
+            self.neighbor_indptr = self._build_indptr(neighbor_keys // self.num_nodes)
+            self.neighbor_indices = (neighbor_keys % self.num_nodes).astype(np.int32)
+        else:
+            self.in_indptr = self.out_indptr
+            self.in_indices = self.out_indices
+            self._neighbor_keys = keys
+            self.neighbor_indptr = self.out_indptr
+            self.neighbor_indices = self.out_indices
+
+        # Mark the arcs whose reverse arc is also present.
+        self.out_reciprocal = self._contains_keys(out_targets * self.num_nodes + out_sources)
+
+    @classmethod
+    def from_networkx(cls, network):
+        """
+        Builds a compact graph from a networkx graph.
+
+        Nodes are indexed in sorted label order when the labels are comparable (and
+        in the network's node order otherwise), so equal networks always produce
+        identical arrays.
+
+        Arguments:
+            network => The input network (directed or undirected).
+
+        Returns:
+            A CompactGraph with the same structure as the input network.
+        """
+
+        labels = list(network.nodes())
+        try:
+            labels = sorted(labels)
+        except TypeError:
+            pass
+
+        index = dict((label, i) for i, label in enumerate(labels))
+        edges = np.array([(index[u], index[v]) for u, v in network.edges()], dtype=np.int64).reshape(-1, 2)
+
+        return cls(len(labels), edges[:, 0], edges[:, 1], directed=network.is_directed(), labels=labels)
+
+    @classmethod
+    def from_edge_list(cls, edges, directed=True, labels=None):
+        """
+        Builds a compact graph from an edge list.
+
+        Arguments:
+            edges => An iterable of (source, target) pairs (any extra columns, such as
+            weights, are ignored).
+            directed => Whether or not the edges are directed.
+            labels => An optional list of all node labels (isolated nodes included). When
+            omitted, nodes are indexed in order of first appearance in the edge list.
+
+        Returns:
+            A CompactGraph built from the edges.
+        """
+
+        edges = [(edge[0], edge[1]) for edge in edges]
+
+        if labels is None:
+            labels = []
+            seen = set()
+            for edge in edges:
+                for node in edge:
+                    if node not in seen:
+                        seen.add(node)
+                        labels.append(node)
+
+        index = dict((label, i) for i, label in enumerate(labels))
+        pairs = np.array([(index[u], index[v]) for u, v in edges], dtype=np.int64).reshape(-1, 2)
+
+        return cls(len(labels), pairs[:, 0], pairs[:, 1], directed=directed, labels=labels)
+
+    def array_state(self):
+        """
+        Returns a dictionary of the arrays describing the graph (see from_array_state).
+        """
+
+        return dict((name, getattr(self, name)) for name in COMPACT_GRAPH_ARRAYS)
+
+    @classmethod
+    def from_array_state(cls, num_nodes, directed, arrays, labels=None):
+        """
+        Rebuilds a compact graph around existing arrays (e.g. arrays in shared memory)
+        without copying or re-sorting them.
+
+        Arguments:
+            num_nodes => The number of nodes in the graph.
+            directed => Whether or not the graph is directed.
+            arrays => A dictionary of arrays as returned by array_state.
+            labels => The original node labels (defaults to the node indices).
+
+        Returns:
+            A CompactGraph viewing the arrays.
+        """
+
+        graph = cls.__new__(cls)
+        graph.num_nodes = int(num_nodes)
+        graph.directed = bool(directed)
+        graph.labels = list(labels) if labels is not None else list(range(graph.num_nodes))
+
+        for name in COMPACT_GRAPH_ARRAYS:
+            setattr(graph, name, arrays[name])
+
+        return graph
+
+    def _build_indptr(self, sorted_sources):
+        """
+        Builds a CSR index pointer array from a sorted array of row indices.
+        """
+
+        counts = np.bincount(sorted_sources, minlength=self.num_nodes)
+        indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+
+        return indptr
+
+    def _contains_keys(self, keys, sorted_keys=None):
+        """
+        Tests which of the given arc keys are present in a sorted key array (the arcs
+        of the graph by default).
+        """
+
+        sorted_keys = self._keys if sorted_keys is None else sorted_keys
+
+        if len(sorted_keys) == 0:
+            return np.zeros(np.shape(keys), dtype=bool)
+
+        positions = np.searchsorted(sorted_keys, keys)
+        positions[positions == len(sorted_keys)] = 0
+
+        return sorted_keys[positions] == keys
+
+    def is_directed(self):
+        return self.directed
+
+    def number_of_nodes(self):
+        return self.num_nodes
+
+    def number_of_edges(self):
+        """
+        Returns the number of arcs (directed) or edges (undirected) in the graph.
+        """
+
+        return len(self._keys) if self.directed else len(self._keys) // 2
+
+    def successors(self, u):
+        return self.out_indices[self.out_indptr[u]:self.out_indptr[u + 1]]
+
+    def predecessors(self, u):
+        return self.in_indices[self.in_indptr[u]:self.in_indptr[u + 1]]
+
+    def neighbors(self, u):
+        """
+        Returns the sorted array of nodes linked to u in either direction.
+        """
+
+        return self.neighbor_indices[self.neighbor_indptr[u]:self.neighbor_indptr[u + 1]]
+
+    def degrees(self):
+        """
+        Returns the number of nodes linked to each node in either direction.
+        """
+
+        return np.diff(self.neighbor_indptr)
+
+    def dyad_degrees(self):
+        """
+        Splits the degree of every node into single-out, single-in and mutual links (the
+        edges of undirected graphs all count as mutual links).
+
+        Returns:
+            A tuple (single_out, single_in, mutual) of integer arrays.
+        """
+
+        out_degrees = np.diff(self.out_indptr)
+        in_degrees = np.diff(self.in_indptr)
+        sources = np.repeat(np.arange(self.num_nodes), out_degrees)
+        mutual = np.bincount(sources[self.out_reciprocal], minlength=self.num_nodes)
+
+        return out_degrees - mutual, in_degrees - mutual, mutual
+
+    def has_edge(self, u, v):
+        """
+        Tests whether the arc u -> v (or the edge u - v when undirected) exists.
+        """
+
+        row = self.successors(u)
+        position = np.searchsorted(row, v)
+
+        return position < len(row) and row[position] == v
+
+    def has_edges(self, sources, targets):
+        """
+        Vectorized version of has_edge for arrays of sources and targets.
+        """
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+
+        return self._contains_keys(sources * self.num_nodes + targets)
+
+    def are_linked(self, sources, targets):
+        """
+        Tests which node pairs are linked in either direction (vectorized).
+        """
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+
+        return self._contains_keys(sources * self.num_nodes + targets, self._neighbor_keys)
+
+    def is_reciprocal(self, u, v):
+        """
+        Tests whether both u -> v and v -> u exist.
+        """
+
+        return self.has_edge(u, v) and self.has_edge(v, u)
+
+    def edges(self):
+        """
+        Returns the (sources, targets) arrays of all arcs, sorted by source and then by
+        target. For undirected graphs each edge is returned once with source < target.
+        """
+
+        sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.out_indptr))
+        targets = self.out_indices
+
+        if not self.directed:
+            keep = sources < targets
+            sources, targets = sources[keep], targets[keep]
+
+        return sources, targets
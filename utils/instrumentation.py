@@ -0,0 +1,145 @@
+"""
+Optional stage timers and counters for the motif pipeline.
+"""
+
+import time
+from collections import OrderedDict
+
+
+# The most precise wall clock available.
+clock = getattr(time, "perf_counter", time.time)
+
+
+class PipelineStats(object):
+    """
+    Collects the wall time spent in each stage of the pipeline and hot-path counters.
+
+    Pass an instance as the stats argument of count_triad_motifs, randomize or
+    compute_normalized_triad_motif_z_scores to fill it; every function skips the bookkeeping
+    entirely when stats is None. Stages may nest (e.g. 'ensemble' contains the 'rewiring' of
+    every random instance), and stages timed in worker processes are summed over the workers.
+
+    Stages:
+        label_conversion => Converting a networkx network to node index arrays.
+        triad_counting => Enumerating and classifying the connected triplets.
+        triad_sampling => Sampling and classifying wedges (approximate counting).
+        partitioning => Splitting an edge-list file into partitions (out-of-core counting).
+        rewiring => Proposing and performing the edge swaps.
+        graph_rebuild => Building a graph from the rewired edges.
+        ensemble => Generating and counting the whole random ensemble.
+        z_scores => Computing the z-scores from the counts.
+
+    Counters:
+        triplets_examined => The number of connected triplets classified.
+        swap_proposals => The number of edge swaps proposed.
+        swaps_accepted => The number of edge swaps performed.
+        ensemble_members => The number of random instances produced.
+
+    Attributes:
+        stage_times => An ordered dictionary mapping each stage to its total time (in seconds).
+        counters => An ordered dictionary mapping each counter to its value.
+        callback => An optional function called as callback(kind, name, value) for every
+        recorded value, where kind is 'stage_time' or 'counter' (e.g. to forward the values to
+        a metrics system as they come in).
+    """
+
+    def __init__(self, callback=None):
+        self.stage_times = OrderedDict()
+        self.counters = OrderedDict()
+        self.callback = callback
+
+    def stage(self, name):
+        """
+        Returns a context manager that adds the wall time of its block to the stage.
+        """
+
+        return _StageTimer(self, name)
+
+    def add_time(self, name, seconds):
+        self.stage_times[name] = self.stage_times.get(name, 0.0) + seconds
+
+        if self.callback is not None:
+            self.callback("stage_time", name, seconds)
+
+    def increment(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + int(amount)
+
+        if self.callback is not None:
+            self.callback("counter", name, int(amount))
+
+    def merge(self, other):
+        """
+        Adds the stage times and counters of other (a PipelineStats or the output of its
+        as_dict method) to these statistics.
+        """
+
+        if isinstance(other, PipelineStats):
+            other = other.as_dict()
+
+        for name, seconds in other["stage_times"].items():
+            self.add_time(name, seconds)
+        for name, amount in other["counters"].items():
+            self.increment(name, amount)
+
+    def as_dict(self):
+        """
+        Returns the statistics as a JSON-serializable dictionary.
+        """
+
+        return {"stage_times": dict(self.stage_times), "counters": dict(self.counters)}
+
+    def as_metrics(self, prefix="triad_motifs"):
+        """
+        Returns the statistics as a flat dictionary of metric names (e.g.
+        'triad_motifs.stage_time.rewiring') to values.
+        """
+
+        metrics = OrderedDict()
+        for name, seconds in self.stage_times.items():
+            metrics["{0}.stage_time.{1}".format(prefix, name)] = seconds
+        for name, amount in self.counters.items():
+            metrics["{0}.{1}".format(prefix, name)] = amount
+
+        return metrics
+
+
+class _StageTimer(object):
+    """
+    Context manager timing one block of a stage.
+    """
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.name, clock() - self.start_time)
+        return False
+
+
+class _NullStage(object):
+    """
+    Context manager that does nothing (used when instrumentation is disabled).
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def timed_stage(stats, name):
+    """
+    Times a block as the given stage of stats (does nothing when stats is None).
+    """
+
+    return _NULL_STAGE if stats is None else stats.stage(name)
@@ -2,155 +2,560 @@
 Builds and returns various networkx networks.
 """
 
+import os
+import re
+import json
+from collections import OrderedDict
+import numpy as np
 import networkx as nx
-import random
-
-
-def randomize(network, num_rewirings=None):
+from rewiring import DyadSwapEngine, EdgeSwapEngine
+from compact_graph import CompactGraph
+from instrumentation import timed_stage
+
+
+# The directory holding the compiled (binary, memory-mappable) versions of the edge-list files.
+GRAPH_CACHE_DIR = "data/.graph_cache"
+
+# The version of the compiled format (bump it to invalidate every cached graph).
+GRAPH_CACHE_VERSION = 1
+
+# The arrays stored for every cached graph.
+GRAPH_CACHE_ARRAYS = ("sources", "targets", "weights", "labels")
+
+# The null models preserved by the edge swaps: the in- and out-degrees ("degree"), or also the
+# number of mutual dyads of every node ("dyad", directed networks only).
+NULL_MODELS = ("degree", "dyad")
+
+# Every dataset shipped under data/: name => (path, directed, node label type).
+DATASETS = OrderedDict([
+    ("protein", ("data/protein_structure.txt", True, int)),
+    ("s208", ("data/electronic_circuits/s208_st.txt", True, int)),
+    ("s420", ("data/electronic_circuits/s420_st.txt", True, int)),
+    ("s838", ("data/electronic_circuits/s838_st.txt", True, int)),
+    ("leader2inter", ("data/social_network/leader2inter_st.txt", True, int)),
+    ("prisoninter", ("data/social_network/prisoninter_st.txt", True, int)),
+    ("word_assoc", ("data/word_association_graph_DSF.txt", True, str)),
+    ("yeast", ("data/transcription/yeast.txt", True, int)),
+    ("e_coli", ("data/transcription/e_coli.txt", True, int)),
+    ("darwin", ("data/word_adjacency/darwinbookinter_st.txt", True, int)),
+    ("french", ("data/word_adjacency/frenchbookinter_st.txt", True, int)),
+    ("japanese", ("data/word_adjacency/japanesebookinter_st.txt", True, int)),
+    ("spanish", ("data/word_adjacency/spanishbookinter_st.txt", True, int))
+])
+
+# The default memory cap (in bytes) of the loaded networks kept by a DatasetCatalog.
+DATASET_CATALOG_MAX_MEMORY = 512 * 1024 ** 2
+
+# Rough memory footprints of a networkx node and edge (used to estimate a network's size).
+NETWORK_BYTES_PER_NODE = 400
+NETWORK_BYTES_PER_EDGE = 300
+
+
+def randomize(network, num_rewirings=None, seed=None, in_place=False, stats=None, null_model="degree",
+              batched=False):
     """
     Randomizes the network such that the degree sequence is preserved. 
 
     Arguments:
         network => The input network.
         num_rewirings => The number of rewirings performed before it is considered
-        randomized (default set to 3 times the number of edges in the network).
-        directed => Whether or not the graph is directed.
+        randomized (default set to 3 times the number of edges in the network), or "auto" to
+        swap until the edges and the motif counts have stabilized (see
+        EdgeSwapEngine.run_until_mixed). The number of swaps used is then stored in the
+        'num_rewirings' graph attribute of the result.
+        seed => A seed for the random edge swaps.
+        in_place => Whether to rewire the input network itself instead of returning a
+        new randomized network (the input network is left untouched by default).
+        stats => An optional PipelineStats recording the stage times and swap counters.
+        null_model => "degree" to preserve the in- and out-degrees, or "dyad" to also preserve
+        the number of mutual dyads of every node (see DyadSwapEngine).
+        batched => Whether to propose and apply the swaps in large batches of array operations
+        (see EdgeSwapEngine.run_batched) instead of one at a time.
 
     Returns:
         A randomized instance of the input network such that the degree sequence is 
         preserved.
     """
 
-    # Set a counter for the number of rewirings successfully completed.
-    rewirings_completed = 0
+    # Load the edges into a swap engine (nodes are referred to by their position in the node list).
+    with timed_stage(stats, "label_conversion"):
+        nodes = list(network.nodes())
+        engine = build_swap_engine(network, nodes, seed=seed, null_model=null_model)
 
-    # Set the required number of rewirings (either inputted value or the total number of edges).
-    num_rewirings = num_rewirings or 3 * nx.number_of_edges(network)
+    # Perform the rewirings (the engine stops early if the network can't be rewired any further).
+    with timed_stage(stats, "rewiring"):
+        num_swaps = _run_rewirings(engine, num_rewirings, batched)
 
-    # Don't terminate until all the necessary rewirings have been performed.
-    while rewirings_completed < num_rewirings:
+    _record_swap_counters(stats, engine)
 
-        # Store the number of edges in the network to avoid repeated computation.
-        network_edges = nx.edges(network)
+    # Write the rewired edges back into the network.
+    with timed_stage(stats, "graph_rebuild"):
+        if in_place:
+            _apply_swapped_edges(network, nodes, engine)
+            rand_network = network
+        else:
+            rand_network = _build_swapped_network(network, nodes, engine)
 
-        # If there isn't at least 1 edge, break out and return.
-        if len(network_edges) == 0:
-            break
+    # Report how many swaps the automatic mode settled on.
+    if num_rewirings == "auto":
+        rand_network.graph["num_rewirings"] = num_swaps
 
-        # Randomly selected a link from the network.
-        link1 = (source1, target1) = random.choice(network_edges)
+    return rand_network
 
-        # Find all the edges that share no nodes with link1.
-        disjoint_links = [link for link in network_edges if not any(node in link for node in link1)]
 
-        # If there are no disjoint links, it would be impossible to randomize the network while
-        # still preserving the degree sequence, so break out and return.
-        if len(disjoint_links) == 0:
-            break
+def random_rewiring(network, seed=None, in_place=False):
+    """
+    Rewires a pair of edges such that the degree sequence is preserved.
 
-        # Randomly selected a DIFFERENT link from the network (no sharing of nodes allowed).
-        link2 = (source2, target2) = random.choice(disjoint_links)
+    Arguments:
+        network => The input network.
+        seed => A seed for the random edge swap.
+        in_place => Whether to rewire the input network itself instead of returning a
+        rewired copy.
 
-        # If the graph is directed, there is only one option.
-        # If the graph is undirected, there are two options, each with a 50-50 chance.
-        if not nx.is_directed(network) and random.random() < 0.5:
+    Returns:
+        A network with one pair of edges randomly rewired.
+    """
 
-            # Rewire links A-B and C-D to A-C and B-D.
-            new_link1 = (source1, source2)
-            new_link2 = (target1, target2)
+    return randomize(network, num_rewirings=1, seed=seed, in_place=in_place)
 
-        else:
 
-            # Rewire links A-B and C-D to A-D and C-B.
-            new_link1 = (source1, target2)
-            new_link2 = (source2, target1)
+def randomize_compact_graph(graph, num_rewirings=None, seed=None, stats=None, null_model="degree", batched=False):
+    """
+    Randomizes a CompactGraph such that the degree sequence is preserved.
 
-        # If the new links aren't in the network already, replace the old links with the new links.
-        if not network.has_edge(*new_link1) and not network.has_edge(*new_link2):
+    The swap engine works on its own snapshot of the edge arrays, so the input graph is
+    never modified and drawing a new random instance costs one O(E) copy.
 
-            # Remove the old links.
-            network.remove_edges_from([link1, link2])
+    Arguments:
+        graph => The input CompactGraph.
+        num_rewirings => The number of rewirings performed before it is considered
+        randomized (default set to 3 times the number of edges in the graph), or "auto" (see
+        randomize; the swaps used are counted by the swaps_accepted counter of stats).
+        seed => A seed for the random edge swaps.
+        stats => An optional PipelineStats recording the stage times and swap counters.
+        null_model => The null model preserved by the swaps (see randomize).
+        batched => Whether to perform the swaps in batches (see randomize).
 
-            # Add the new links.
-            network.add_edges_from([new_link1, new_link2])
+    Returns:
+        A new, randomized CompactGraph with the same node labels.
+    """
 
-            # Incrememnt our rewiring counter.
-            rewirings_completed += 1
+    with timed_stage(stats, "rewiring"):
+        sources, targets = graph.edges()
+        engine = _make_swap_engine(sources, targets, graph.num_nodes, graph.directed, seed, null_model)
+        _run_rewirings(engine, num_rewirings, batched)
 
-    return network
+    _record_swap_counters(stats, engine)
 
+    with timed_stage(stats, "graph_rebuild"):
+        return CompactGraph(graph.num_nodes, *engine.edges(), directed=graph.directed, labels=graph.labels)
 
-def random_rewiring(network):
+
+def _run_rewirings(engine, num_rewirings=None, batched=False):
+    """
+    Performs the requested number of swaps (default set to 3 times the number of edges), or
+    swaps until the edges and the motif counts have mixed when num_rewirings is "auto" (in
+    batches when batched is set).
+
+    Returns:
+        The number of swaps performed.
     """
-    Rewires a pair of edges such that the degree sequence is preserved.
+
+    if num_rewirings != "auto":
+        run = engine.run_batched if batched else engine.run
+        return run(num_rewirings or 3 * engine.number_of_edges())
+
+    # Imported here since the motif counting module builds on this one.
+    from triad_motif_profile import count_triad_motifs
+
+    def motif_counts(engine):
+        return count_triad_motifs(CompactGraph(engine.num_nodes, *engine.edges(), directed=engine.directed))
+
+    return engine.run_until_mixed(statistic=motif_counts, batched=batched)["num_swaps"]
+
+
+def _record_swap_counters(stats, engine):
+    """
+    Adds the proposals and accepted swaps of a swap engine to stats (if any).
+    """
+
+    if stats is not None:
+        stats.increment("swap_proposals", engine.num_proposals)
+        stats.increment("swaps_accepted", engine.num_swaps)
+
+
+def build_swap_engine(network, nodes=None, seed=None, null_model="degree"):
+    """
+    Builds a swap engine holding the edges of the network.
 
     Arguments:
         network => The input network.
+        nodes => The list of network nodes (edges are stored as indices into this list;
+        default set to the network's node order).
+        seed => A seed for the random edge swaps.
+        null_model => The null model preserved by the swaps (see randomize).
 
     Returns:
-        A network with one pair of edges randomly rewired.
+        An EdgeSwapEngine (or a DyadSwapEngine) over the network edges.
     """
 
-    # Don't terminate until the rewiring is performed.
-    while True:
+    nodes = nodes if nodes is not None else list(network.nodes())
+    index = dict((node, i) for i, node in enumerate(nodes))
+    edges = [(index[u], index[v]) for u, v in network.edges()]
 
-        # Store the number of edges in the network to avoid repeated computation.
-        network_edges = nx.edges(network)
+    return _make_swap_engine([u for u, _ in edges], [v for _, v in edges], len(nodes), network.is_directed(),
+                             seed, null_model)
 
-        # If there isn't at least 1 edge, break out and return.
-        if len(network_edges) == 0:
-            break
 
-        # Randomly selected a link from the network.
-        link1 = (source1, target1) = random.choice(network_edges)
+def _make_swap_engine(sources, targets, num_nodes, directed, seed, null_model):
+    """
+    Builds the swap engine of the given null model (undirected edges have no mutual dyads to
+    preserve, so both null models use a plain EdgeSwapEngine for them).
+    """
 
-        # Find all the edges that share no nodes with link1.
-        disjoint_links = [link for link in network_edges if not any(node in link for node in link1)]
+    if null_model not in NULL_MODELS:
+        raise ValueError("Unknown null model: {}".format(null_model))
 
-        # If there are no disjoint links, it would be impossible to randomize the network while
-        # still preserving the degree sequence, so break out and return.
-        if len(disjoint_links) == 0:
-            break
+    if null_model == "dyad" and directed:
+        return DyadSwapEngine(sources, targets, num_nodes, seed=seed)
 
-        # Randomly selected a DIFFERENT link from the network (no sharing of nodes allowed).
-        link2 = (source2, target2) = random.choice(disjoint_links)
+    return EdgeSwapEngine(sources, targets, num_nodes, directed=directed, seed=seed)
 
-        # If the graph is directed, there is only one option.
-        # If the graph is undirected, there are two options, each with a 50-50 chance.
-        if not nx.is_directed(network) and random.random() < 0.5:
 
-            # Rewire links A-B and C-D to A-C and B-D.
-            new_link1 = (source1, source2)
-            new_link2 = (target1, target2)
+def _apply_swapped_edges(network, nodes, engine):
+    """
+    Replaces the edges of the network that were rewired by the swap engine (the
+    attributes of untouched edges are kept).
 
-        else:
+    Arguments:
+        network => The network the engine was built from.
+        nodes => The node list used when building the engine.
+        engine => The EdgeSwapEngine after swapping.
+    """
+
+    engine_edges = list(zip(*[endpoints.tolist() for endpoints in engine.edges()]))
+    new_edges = set((nodes[u], nodes[v]) for u, v in engine_edges)
+
+    # Undirected edges may be reported in either orientation.
+    if not network.is_directed():
+        new_edges.update([(v, u) for u, v in new_edges])
+
+    removed_edges = [edge for edge in network.edges() if edge not in new_edges]
+    added_edges = [(nodes[u], nodes[v]) for u, v in engine_edges if not network.has_edge(nodes[u], nodes[v])]
 
-            # Rewire links A-B and C-D to A-D and C-B.
-            new_link1 = (source1, target2)
-            new_link2 = (source2, target1)
+    network.remove_edges_from(removed_edges)
+    network.add_edges_from(added_edges)
 
-        # If the new links aren't in the network already, replace the old links with the new links.
-        if not network.has_edge(*new_link1) and not network.has_edge(*new_link2):
 
-            # Remove the old links.
-            network.remove_edges_from([link1, link2])
+def _build_swapped_network(network, nodes, engine):
+    """
+    Builds a new network with the nodes of the input network and the edges of the swap
+    engine (edges that were not rewired keep their attributes).
+
+    Arguments:
+        network => The network the engine was built from.
+        nodes => The node list used when building the engine.
+        engine => The EdgeSwapEngine after swapping.
+
+    Returns:
+        A new network of the same type as the input network.
+    """
+
+    rand_network = network.__class__()
+    rand_network.graph.update(network.graph)
+    rand_network.add_nodes_from(network.nodes(data=True))
+
+    edges = [(nodes[u], nodes[v]) for u, v in zip(*[endpoints.tolist() for endpoints in engine.edges()])]
+    rand_network.add_edges_from((u, v, dict(network[u][v]) if network.has_edge(u, v) else {})
+                                for u, v in edges)
+
+    return rand_network
+
+
+class DatasetCatalog(object):
+    """
+    Lazily loads the datasets by name and keeps recently used networks in memory.
 
-            # Add the new links.
-            network.add_edges_from([new_link1, new_link2])
+    A dataset is only read (through the binary graph cache) the first time it is requested.
+    The loaded networks are frozen, so repeat requests hand out the same read-only network
+    without re-parsing. When the estimated memory of the kept networks exceeds the cap, the
+    least recently used ones are dropped.
 
-            # Returned the slightly altered new network.
+    Attributes:
+        datasets => A mapping of dataset name => (path, directed, node label type).
+        max_memory => The memory cap (in bytes) of the kept networks.
+    """
+
+    def __init__(self, datasets=DATASETS, max_memory=DATASET_CATALOG_MAX_MEMORY, cache_dir=GRAPH_CACHE_DIR):
+        """
+        Arguments:
+            datasets => A mapping of dataset name => (path, directed, node label type).
+            max_memory => The memory cap (in bytes) of the kept networks.
+            cache_dir => The directory of the binary graph cache (None disables the cache).
+        """
+
+        self.datasets = datasets
+        self.max_memory = max_memory
+        self._cache_dir = cache_dir
+        self._networks = OrderedDict()
+        self._memory = 0
+
+    def names(self):
+        return list(self.datasets)
+
+    def load(self, name):
+        """
+        Returns the (read-only) network of a dataset, loading it on first access.
+
+        Arguments:
+            name => The name of the dataset (see DATASETS).
+
+        Returns:
+            A frozen networkx network.
+        """
+
+        # Move a kept network to the most recently used position.
+        if name in self._networks:
+            network, size = self._networks.pop(name)
+            self._networks[name] = network, size
             return network
 
+        if name not in self.datasets:
+            raise KeyError("Unknown dataset: {}".format(name))
+
+        path, directed, nodetype = self.datasets[name]
+        network = nx.freeze(load_edge_list_network(path, nodetype=nodetype, directed=directed,
+                                                   cache_dir=self._cache_dir))
+        size = estimate_network_memory(network)
+
+        self._networks[name] = network, size
+        self._memory += size
+
+        # Drop the least recently used networks (always keeping the one just loaded).
+        while self._memory > self.max_memory and len(self._networks) > 1:
+            _, (_, evicted_size) = self._networks.popitem(last=False)
+            self._memory -= evicted_size
+
+        return network
+
+    def memory(self):
+        """
+        Returns the estimated memory (in bytes) of the networks currently kept.
+        """
+
+        return self._memory
+
+    def clear(self):
+        """
+        Drops every kept network.
+        """
+
+        self._networks.clear()
+        self._memory = 0
+
+
+# The catalog used by load_network and the load_*_network functions.
+default_catalog = DatasetCatalog()
+
+
+def load_network(name):
+    """
+    Loads a dataset by name through the default catalog.
+
+    Arguments:
+        name => The name of the dataset (see DATASETS).
+
+    Returns:
+        A frozen (read-only) networkx network.
+    """
+
+    return default_catalog.load(name)
+
+
+def estimate_network_memory(network):
+    """
+    Roughly estimates the memory (in bytes) taken by a networkx network.
+    """
+
+    return (NETWORK_BYTES_PER_NODE * network.number_of_nodes() +
+            NETWORK_BYTES_PER_EDGE * network.number_of_edges())
+
+
+def load_edge_list_network(path, nodetype=int, directed=True, cache_dir=GRAPH_CACHE_DIR):
+    """
+    Loads a weighted edge-list file as a networkx network (through the binary graph cache).
+
+    Arguments:
+        path => The path of the edge-list file.
+        nodetype => The type of the node labels (int or str).
+        directed => Whether or not the network is directed.
+        cache_dir => The directory of the binary graph cache (None disables the cache).
+
+    Returns:
+        A networkx network whose edges carry a 'weight' attribute.
+    """
+
+    sources, targets, weights, labels = load_edge_arrays(path, nodetype=nodetype, cache_dir=cache_dir)
+    labels = labels.tolist()
+
+    network = nx.DiGraph() if directed else nx.Graph()
+    network.add_nodes_from(labels)
+    network.add_weighted_edges_from((labels[u], labels[v], w)
+                                    for u, v, w in zip(sources.tolist(), targets.tolist(), weights.tolist()))
+
+    return network
+
+
+def load_compact_graph(path, nodetype=int, directed=True, cache_dir=GRAPH_CACHE_DIR):
+    """
+    Loads an edge-list file straight into a CompactGraph (no networkx graph is built).
+
+    Arguments:
+        path => The path of the edge-list file.
+        nodetype => The type of the node labels (int or str).
+        directed => Whether or not the graph is directed.
+        cache_dir => The directory of the binary graph cache (None disables the cache).
+
+    Returns:
+        A CompactGraph of the edges (node i is labels[i] in the file).
+    """
+
+    sources, targets, _, labels = load_edge_arrays(path, nodetype=nodetype, cache_dir=cache_dir)
+
+    return CompactGraph(len(labels), sources, targets, directed=directed, labels=labels.tolist())
+
+
+def load_edge_arrays(path, nodetype=int, cache_dir=GRAPH_CACHE_DIR):
+    """
+    Loads a weighted edge-list file as arrays.
+
+    The first load parses the text file and compiles it into .npy files under cache_dir. Later
+    loads memory-map those files instead, as long as the entry was compiled from the same file
+    (by absolute path) and its size and modification time are unchanged.
+
+    Arguments:
+        path => The path of the edge-list file.
+        nodetype => The type of the node labels (int or str).
+        cache_dir => The directory of the binary graph cache (None disables the cache).
+
+    Returns:
+        A tuple (sources, targets, weights, labels) of arrays where sources and targets hold
+        indices into labels, the node labels in order of first appearance.
+    """
+
+    if cache_dir is None:
+        return read_edge_arrays(path, nodetype)
+
+    entry_dir = os.path.join(cache_dir, cache_entry_name(path))
+    meta_path = os.path.join(entry_dir, "meta.json")
+    source_stat = os.stat(path)
+    meta = {"version": GRAPH_CACHE_VERSION,
+            "path": os.path.abspath(path),
+            "nodetype": nodetype.__name__,
+            "size": source_stat.st_size,
+            "mtime": source_stat.st_mtime}
+
+    # Memory-map the compiled arrays if they match the current source file.
+    if os.path.exists(meta_path):
+        with open(meta_path) as meta_file:
+            if json.load(meta_file) == meta:
+                return tuple(np.load(os.path.join(entry_dir, name + ".npy"), mmap_mode="r")
+                             for name in GRAPH_CACHE_ARRAYS)
+
+    arrays = read_edge_arrays(path, nodetype)
+
+    # Write the arrays first and the metadata last, so a partial entry is never considered fresh.
+    if not os.path.isdir(entry_dir):
+        os.makedirs(entry_dir)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for name, array in zip(GRAPH_CACHE_ARRAYS, arrays):
+        np.save(os.path.join(entry_dir, name + ".npy"), array)
+    with open(meta_path, "w") as meta_file:
+        json.dump(meta, meta_file)
+
+    return arrays
+
+
+def cache_entry_name(path):
+    """
+    Returns the directory name of a file's entry in an on-disk cache (different paths may map
+    to the same name, so entries must also record the path they were built from).
+    """
+
+    return path.replace(os.sep, "_").replace(".", "_")
+
+
+def read_edge_arrays(path, nodetype=int):
+    """
+    Reads a whitespace-separated "source target [weight]" edge-list file in bulk with NumPy.
+
+    Lines starting with # are comments, and missing weights default to 1. The whole file is
+    split and converted at once, and the node labels are indexed in order of first appearance
+    without a per-line Python loop.
+
+    Arguments:
+        path => The path of the edge-list file.
+        nodetype => The type of the node labels (int or str).
+
+    Returns:
+        A tuple (sources, targets, weights, labels) of arrays where sources and targets hold
+        int32 indices into labels.
+    """
+
+    with open(path) as edge_file:
+        text = edge_file.read()
+
+    # Strip the comment blocks.
+    if "#" in text:
+        text = re.sub(r"#[^\n]*", "", text)
+
+    tokens = text.split()
+    first_line = next((fields for fields in (line.split() for line in text.splitlines()) if len(fields) >= 2), [])
+    num_columns = min(len(first_line), 3)
+
+    # Irregular files (lines left with a single field once comments are stripped, or with a
+    # varying number of columns) are normalized line by line, dropping lines without an edge.
+    num_lines = len(re.findall(r"^[ \t]*\S", text, re.M))
+    if len(tokens) != num_columns * num_lines and num_columns >= 2:
+        rows = [fields for fields in (line.split() for line in text.splitlines()) if len(fields) >= 2]
+        num_columns = 3 if any(len(fields) > 2 for fields in rows) else 2
+        tokens = [token for fields in rows for token in (fields + ["1"])[:num_columns]]
+
+    if num_columns < 2:
+        empty = np.zeros(0, dtype=np.int32)
+        return empty, empty, np.zeros(0), np.array([], dtype=nodetype)
+
+    # Parse integer endpoints straight to int64 (going through floats would merge the labels
+    # above 2 ** 53 and truncate non-integer tokens instead of raising a ValueError).
+    columns = np.array(tokens, dtype=object).reshape(-1, num_columns)
+    if nodetype is int:
+        endpoints = columns[:, :2].astype(np.str_).astype(np.int64)
+    else:
+        endpoints = columns[:, :2].astype(np.str_)
+
+    if num_columns == 3:
+        weights = columns[:, 2].astype(np.float64)
+    else:
+        weights = np.ones(len(columns))
+
+    # Index the labels in order of first appearance (reading sources and targets alternately).
+    labels, first_positions, inverse = np.unique(endpoints.ravel(), return_index=True, return_inverse=True)
+    order = np.argsort(first_positions, kind="mergesort")
+    ranks = np.empty(len(labels), dtype=np.int32)
+    ranks[order] = np.arange(len(labels), dtype=np.int32)
+    indices = ranks[inverse.ravel()].reshape(-1, 2)
+
+    return indices[:, 0].copy(), indices[:, 1].copy(), weights, labels[order]
+
 
 def load_protein_network():
     """
     Loads the directed protein network from class.
     """
 
-    network = nx.read_edgelist("data/protein_structure.txt",
-                               create_using=nx.DiGraph(),
-                               nodetype=int,
-                               data=[('weight', float)])
+    network = load_network("protein")
 
     return network
 
@@ -160,10 +565,7 @@ def load_s208_electronic_circuit_network():
     Loads the directed s208 electronic circuit network from class.
     """
 
-    network = nx.read_edgelist("data/electronic_circuits/s208_st.txt",
-                               create_using=nx.DiGraph(),
-                               nodetype=int,
-                               data=[('weight', float)])
+    network = load_network("s208")
 
     return network
 
@@ -173,10 +575,7 @@ def load_s420_electronic_circuit_network():
     Loads the directed s420 electronic circuit network from class.
     """
 
-    network = nx.read_edgelist("data/electronic_circuits/s420_st.txt",
-                               create_using=nx.DiGraph(),
-                               nodetype=int,
-                               data=[('weight', float)])
+    network = load_network("s420")
 
     return network
 
@@ -186,10 +585,7 @@ def load_s838_electronic_circuit_network():
     Loads the directed s838 electronic circuit network from class.
     """
 
-    network = nx.read_edgelist("data/electronic_circuits/s838_st.txt",
-                               create_using=nx.DiGraph(),
-                               nodetype=int,
-                               data=[('weight', float)])
+    network = load_network("s838")
 
     return network
 
@@ -199,10 +595,7 @@ def load_leader2inter_social_network():
     Loads the directed leader2inter social network from class.
     """
 
-    network = nx.read_edgelist("data/social_network/leader2inter_st.txt",
-                               create_using=nx.DiGraph(),
-                               nodetype=int,
-                               data=[('weight', float)])
+    network = load_network("leader2inter")
 
     return network
 
@@ -212,10 +605,7 @@ def load_prisoninter_social_network():
     Loads the directed prisoninter social network from class.
     """
 
-    network = nx.read_edgelist("data/social_network/prisoninter_st.txt",
-                               create_using=nx.DiGraph(),
-                               nodetype=int,
-                               data=[('weight', float)])
+    network = load_network("prisoninter")
 
     return network
 
@@ -225,10 +615,67 @@ def load_word_assoc_network():
     Loads the directed word association network from class.
     """
 
-    network = nx.read_edgelist("data/word_association_graph_DSF.txt",
-                                          create_using=nx.DiGraph(), 
-                                          nodetype=str,
-                                          data=[('weight', float)])
+    network = load_network("word_assoc")
+
+    return network
+
+
+def load_yeast_transcription_network():
+    """
+    Loads the directed yeast transcription network from class.
+    """
+
+    network = load_network("yeast")
+
+    return network
+
+
+def load_e_coli_transcription_network():
+    """
+    Loads the directed E. coli transcription network from class.
+    """
+
+    network = load_network("e_coli")
+
+    return network
+
+
+def load_darwin_word_adjacency_network():
+    """
+    Loads the directed Darwin (English) word adjacency network from class.
+    """
+
+    network = load_network("darwin")
+
+    return network
+
+
+def load_french_word_adjacency_network():
+    """
+    Loads the directed French word adjacency network from class.
+    """
+
+    network = load_network("french")
+
+    return network
+
+
+def load_japanese_word_adjacency_network():
+    """
+    Loads the directed Japanese word adjacency network from class.
+    """
+
+    network = load_network("japanese")
+
+    return network
+
+
+def load_spanish_word_adjacency_network():
+    """
+    Loads the directed Spanish word adjacency network from class.
+    """
+
+    network = load_network("spanish")
 
     return network
 
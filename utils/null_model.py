@@ -0,0 +1,178 @@
+"""
+Analytical (configuration model) null model of the triad motif counts, used to screen
+networks without building an ensemble of random instances.
+"""
+
+import numpy as np
+from compact_graph import CompactGraph
+from triad_motif_profile import (CLOSED_MOTIF_WEDGE_TYPES, NUM_WEDGE_TYPES, count_triad_motifs,
+                                 extract_triad_motif_significance_profile, _compute_z_scores)
+
+
+# For every closed directed motif: its number of single (asymmetric) arcs, its number of
+# mutual dyads and its number of automorphisms.
+CLOSED_MOTIF_STRUCTURE = {
+    6: (3, 0, 1),
+    7: (3, 0, 3),
+    8: (2, 1, 2),
+    9: (2, 1, 2),
+    10: (2, 1, 1),
+    11: (1, 2, 1),
+    12: (0, 3, 6),
+}
+
+# Motifs expected to occur fewer times than this are flagged as unreliable.
+QUICK_MIN_EXPECTED_COUNT = 10
+
+
+def expected_triad_motif_counts(network, directed=None, min_expected_count=QUICK_MIN_EXPECTED_COUNT):
+    """
+    Estimates the mean and variance of every triad motif count under a configuration model
+    preserving each node's single-out, single-in and mutual degrees, in O(n) time.
+
+    The number of wedges of each type is fixed by the degree sequences. A single arc u -> v
+    appears with probability out_u * in_v / A (A single arcs) and a mutual dyad u <-> v with
+    probability mutual_u * mutual_v / 2M (M mutual dyads), so the expected count of each closed
+    motif is a product of per-node stub sums. Every open motif is the wedges of its type minus
+    those closed into triangles. Closed counts are treated as independent Poisson variables,
+    which also gives the variance of the open counts.
+
+    The approximation assumes no two nodes are expected to be linked more than once; motifs
+    built from a link type whose largest hubs break that (the structural cutoff, e.g.
+    max(out) * max(in) > A) or expected to occur only a handful of times are flagged as
+    unreliable.
+
+    Since the mutual degrees are preserved, networks rich in mutual dyads get a stricter null
+    model than the ensembles of randomize (whose arc swaps create and destroy mutual dyads).
+
+    Arguments:
+        network => The input network (a networkx graph or a CompactGraph).
+        directed => Whether or not the network is directed.
+        min_expected_count => Motifs expected fewer times than this are flagged as unreliable.
+
+    Returns:
+        A tuple (expected_counts, variances, reliable) of arrays indexed like the output of
+        count_triad_motifs.
+    """
+
+    graph = network if isinstance(network, CompactGraph) else CompactGraph.from_networkx(network)
+    directed = directed or graph.is_directed()
+
+    single_out, single_in, mutual = [degrees.astype(float) for degrees in graph.dyad_degrees()]
+    num_single_arcs = single_out.sum()
+    num_mutual_stubs = mutual.sum()
+
+    # The sum over all nodes of the number of ordered stub pairs of each wedge type.
+    pair_sums = np.array([np.sum(single_out * (single_out - 1)),
+                          np.sum(single_in * (single_in - 1)),
+                          np.sum(single_out * single_in),
+                          np.sum(single_in * mutual),
+                          np.sum(single_out * mutual),
+                          np.sum(mutual * (mutual - 1))])
+
+    # Types 0, 1 and 5 pair up two stubs of the same kind, so each wedge was counted twice.
+    wedges = pair_sums / np.array([2, 2, 1, 1, 1, 2])
+
+    # Links whose hubs break the structural cutoff can't be treated as independent.
+    single_cutoff_broken = num_single_arcs > 0 and single_out.max() * single_in.max() > num_single_arcs
+    mutual_cutoff_broken = num_mutual_stubs > 0 and mutual.max() ** 2 > num_mutual_stubs
+
+    expected_counts = np.zeros(13)
+    variances = np.zeros(13)
+    reliable = np.ones(13, dtype=bool)
+
+    expected_counts[:NUM_WEDGE_TYPES] = wedges
+
+    for motif, (num_single, num_mutual, num_automorphisms) in CLOSED_MOTIF_STRUCTURE.items():
+        wedge_types = CLOSED_MOTIF_WEDGE_TYPES[motif]
+
+        # A motif needing a kind of link the network lacks can't occur.
+        if (num_single and num_single_arcs == 0) or (num_mutual and num_mutual_stubs == 0):
+            continue
+
+        expected = np.prod(pair_sums[list(wedge_types)])
+        expected /= num_single_arcs ** num_single * num_mutual_stubs ** num_mutual * num_automorphisms
+
+        expected_counts[motif] = expected
+        variances[motif] = expected
+        reliable[motif] = not ((num_single and single_cutoff_broken) or (num_mutual and mutual_cutoff_broken))
+
+        # Every closed motif takes its wedges away from the open counts.
+        for wedge_type in set(wedge_types):
+            multiplicity = wedge_types.count(wedge_type)
+            expected_counts[wedge_type] -= multiplicity * expected
+            variances[wedge_type] += multiplicity ** 2 * expected
+            reliable[wedge_type] &= reliable[motif]
+
+    expected_counts = np.maximum(expected_counts, 0)
+    reliable &= expected_counts >= min_expected_count
+
+    # Undirected networks only have mutual links: triangles are motif 12 and chains motif 5.
+    if not directed:
+        return expected_counts[[12, 5]], variances[[12, 5]], reliable[[12, 5]]
+
+    return expected_counts, variances, reliable
+
+
+def compute_quick_triad_motif_z_scores(network, min_expected_count=QUICK_MIN_EXPECTED_COUNT, engine="auto",
+                                       num_samples=None, seed=None):
+    """
+    Computes provisional triad motif z-scores against the analytical null model (see
+    expected_triad_motif_counts) instead of an ensemble of random instances.
+
+    The null model costs O(n); counting the motifs of the network itself costs whatever the
+    chosen counting engine costs (use engine="sampling" for a screen that doesn't enumerate
+    every triad).
+
+    Arguments:
+        network => The input network (can be directed or undirected).
+        min_expected_count => Motifs expected fewer times than this are flagged as unreliable.
+        engine, num_samples, seed => The counting engine used for the network and its options
+        (see count_triad_motifs).
+
+    Returns:
+        A tuple (z_scores, reliable) where reliable flags the motifs whose z-score can be
+        trusted (the others need a full ensemble).
+    """
+
+    graph = network if isinstance(network, CompactGraph) else CompactGraph.from_networkx(network)
+
+    motif_counts = count_triad_motifs(graph, engine=engine, num_samples=num_samples, seed=seed)
+    expected_counts, variances, reliable = expected_triad_motif_counts(graph, min_expected_count=min_expected_count)
+
+    return _compute_z_scores(motif_counts, expected_counts, np.sqrt(variances)), reliable
+
+
+def extract_quick_triad_motif_significance_profile(network, refine=False, min_expected_count=QUICK_MIN_EXPECTED_COUNT,
+                                                   **ensemble_options):
+    """
+    Computes a provisional triad motif significance profile from the analytical null model.
+
+    Arguments:
+        network => The input network (can be directed or undirected).
+        refine => Whether to replace the unreliable z-scores with those of a full ensemble (only
+        computed when at least one motif is unreliable).
+        min_expected_count => Motifs expected fewer times than this are flagged as unreliable.
+        ensemble_options => The keyword arguments of extract_triad_motif_significance_profile
+        used when refining (the ensemble always uses the "dyad" null model, which preserves the
+        same degrees as the analytical model).
+
+    Returns:
+        A tuple (significance_profile, reliable) where reliable flags the motifs whose z-score
+        came from the analytical null model and can be trusted (after refining, every motif
+        is reliable).
+    """
+
+    # Splicing in z-scores from an ensemble of a different null model would mix two null models.
+    if refine and ensemble_options.setdefault("null_model", "dyad") != "dyad":
+        raise ValueError("Refining requires the dyad null model, not: {}".format(ensemble_options["null_model"]))
+
+    significance_profile, reliable = compute_quick_triad_motif_z_scores(network,
+                                                                        min_expected_count=min_expected_count)
+
+    if refine and not np.all(reliable):
+        ensemble_profile = extract_triad_motif_significance_profile(network, **ensemble_options)
+        significance_profile[~reliable] = ensemble_profile[~reliable]
+        reliable = np.ones(len(reliable), dtype=bool)
+
+    return significance_profile, reliable
@@ -0,0 +1,425 @@
+"""
+Out-of-core triad motif counting for edge lists larger than memory.
+"""
+
+import os
+import json
+import itertools
+import numpy as np
+from instrumentation import timed_stage
+from networks import cache_entry_name
+from triad_motif_profile import (DIRECTED_TRIAD_MOTIF_TABLE, count_wedge_types,
+                                 _complete_open_triad_motif_counts)
+
+
+# The directory holding the partitioned versions of the edge-list files.
+OUT_OF_CORE_DIR = "data/.out_of_core"
+
+# The version of the partition file format (bump it to invalidate existing partitions).
+OUT_OF_CORE_VERSION = 1
+
+# The default memory budget (in bytes) of building and counting.
+DEFAULT_MEMORY_BUDGET = 256 * 1024 ** 2
+
+# The approximate memory (in bytes) taken per edge while sorting a partition and per node pair
+# while checking a batch of candidate triangles.
+BYTES_PER_PARTITION_EDGE = 100
+BYTES_PER_CANDIDATE_PAIR = 200
+
+# The number of edge-list lines parsed at once.
+PARSE_CHUNK_LINES = 1000000
+
+# The name of the files holding the partition metadata and the counting checkpoint.
+PARTITION_META_FILE = "meta.json"
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def count_triad_motifs_out_of_core(path, nodetype=int, directed=True, work_dir=None,
+                                   memory_budget=DEFAULT_MEMORY_BUDGET, stats=None):
+    """
+    Counts the triad motifs of an edge-list file without loading the network into memory.
+
+    The file is first split into node-partitioned, memory-mapped files (see
+    build_partitioned_graph), then the partitions are streamed through one at a time (see
+    count_partitioned_triad_motifs). Both steps are skipped when their results are already on
+    disk, and an interrupted count resumes from the last partition completed.
+
+    Arguments:
+        path => The path of the edge-list file.
+        nodetype => The type of the node labels (int or str).
+        directed => Whether or not the network is directed.
+        work_dir => The directory holding the partitions (default set to an entry of
+        OUT_OF_CORE_DIR named after the file).
+        memory_budget => The approximate memory (in bytes) used while building and counting.
+        stats => An optional PipelineStats recording the stage times and triplets examined.
+
+    Returns:
+        The same motif count array as count_triad_motifs.
+    """
+
+    if work_dir is None:
+        work_dir = os.path.join(OUT_OF_CORE_DIR, cache_entry_name(path) + ("_directed" if directed else "_undirected"))
+
+    with timed_stage(stats, "partitioning"):
+        build_partitioned_graph(path, work_dir, nodetype=nodetype, directed=directed, memory_budget=memory_budget)
+
+    return count_partitioned_triad_motifs(work_dir, memory_budget=memory_budget, stats=stats)
+
+
+def build_partitioned_graph(path, work_dir, nodetype=int, directed=True, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    Splits an edge-list file into node-partitioned files.
+
+    Node u belongs to partition u % P. Partition p holds one record per node pair (u, v) with u
+    in p and u, v linked in either direction: the sorted keys u * N + v and a flag byte (bit 0
+    => u -> v, bit 1 => v -> u). The file is streamed in chunks into per-partition bucket
+    files, and each bucket is then sorted, deduplicated and saved as memory-mappable .npy
+    files, so only one partition needs to fit in memory at a time. P is chosen from the file
+    size so a partition fits in memory_budget.
+
+    Nothing is rebuilt when the partitions on disk match the file's size and modification time
+    (the metadata is written last, so an interrupted build is simply redone).
+
+    Arguments:
+        path => The path of the edge-list file.
+        work_dir => The directory the partitions are written to.
+        nodetype => The type of the node labels (int or str).
+        directed => Whether or not the network is directed.
+        memory_budget => The approximate memory (in bytes) used while sorting a partition.
+
+    Returns:
+        The partition metadata (a dictionary with 'num_nodes' and 'num_partitions' among others).
+    """
+
+    source_stat = os.stat(path)
+    signature = {"version": OUT_OF_CORE_VERSION,
+                 "path": os.path.abspath(path),
+                 "nodetype": nodetype.__name__,
+                 "directed": bool(directed),
+                 "size": source_stat.st_size,
+                 "mtime": source_stat.st_mtime}
+
+    meta_path = os.path.join(work_dir, PARTITION_META_FILE)
+    if os.path.exists(meta_path):
+        with open(meta_path) as meta_file:
+            meta = json.load(meta_file)
+        if meta["signature"] == signature:
+            return meta
+        os.remove(meta_path)
+
+    if not os.path.isdir(work_dir):
+        os.makedirs(work_dir)
+
+    # A stale checkpoint belongs to the old partitions.
+    checkpoint_path = os.path.join(work_dir, CHECKPOINT_FILE)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    num_partitions = max(1, int(np.ceil(_estimate_num_edges(path) * BYTES_PER_PARTITION_EDGE / float(memory_budget))))
+    labels = _write_partition_buckets(path, work_dir, num_partitions, nodetype, directed)
+    num_nodes = len(labels)
+
+    for partition in range(num_partitions):
+        _sort_partition_bucket(work_dir, partition, num_nodes)
+
+    np.save(os.path.join(work_dir, "labels.npy"), np.array(labels, dtype=nodetype))
+
+    meta = {"signature": signature, "num_nodes": num_nodes, "num_partitions": num_partitions}
+    with open(meta_path, "w") as meta_file:
+        json.dump(meta, meta_file)
+
+    return meta
+
+
+def count_partitioned_triad_motifs(work_dir, memory_budget=DEFAULT_MEMORY_BUDGET, stats=None):
+    """
+    Counts the triad motifs of a partitioned graph (see build_partitioned_graph), one partition
+    at a time.
+
+    Only triangles are enumerated: for every center u of a partition, the pairs of its
+    neighbors v < w with u < v are checked for a link (looked up by binary search in the
+    memory-mapped partition of v), so each triangle is found once, from its smallest node. The
+    open motifs follow from the wedge counts of every node's single-out, single-in and mutual
+    degrees minus the wedges closed into triangles (as in the matrix engine). The partial
+    counts are checkpointed after every partition, so an interrupted count resumes where it
+    stopped.
+
+    Arguments:
+        work_dir => The directory holding the partitions.
+        memory_budget => The approximate memory (in bytes) used per batch of candidate pairs.
+        stats => An optional PipelineStats recording the stage times and triplets examined.
+
+    Returns:
+        The same motif count array as count_triad_motifs.
+    """
+
+    with open(os.path.join(work_dir, PARTITION_META_FILE)) as meta_file:
+        meta = json.load(meta_file)
+
+    num_nodes = meta["num_nodes"]
+    num_partitions = meta["num_partitions"]
+    batch_size = max(1, memory_budget // BYTES_PER_CANDIDATE_PAIR)
+
+    checkpoint = _load_checkpoint(work_dir, meta)
+    motif_counts = np.array(checkpoint["motif_counts"], dtype=np.int64)
+    wedge_counts = np.array(checkpoint["wedge_counts"], dtype=np.int64)
+    partitions = _PartitionLookup(work_dir, num_nodes, num_partitions)
+
+    for partition in range(num_partitions):
+        if partition in checkpoint["completed"]:
+            continue
+
+        with timed_stage(stats, "triad_counting"):
+            partition_motifs, partition_wedges, num_candidates = _count_partition(partitions, partition, batch_size)
+
+        motif_counts += partition_motifs
+        wedge_counts += partition_wedges
+        checkpoint["completed"].append(partition)
+        checkpoint["motif_counts"] = motif_counts.tolist()
+        checkpoint["wedge_counts"] = wedge_counts.tolist()
+        _save_checkpoint(work_dir, checkpoint)
+
+        if stats is not None:
+            stats.increment("triplets_examined", num_candidates)
+
+    _complete_open_triad_motif_counts(motif_counts, wedge_counts)
+
+    # Undirected networks only have mutual links: triangles are motif 12 and chains motif 5.
+    if not meta["signature"]["directed"]:
+        return motif_counts[[12, 5]].astype(int)
+
+    return motif_counts.astype(int)
+
+
+def _estimate_num_edges(path):
+    """
+    Estimates the number of edges of an edge-list file from its size and its first lines.
+    """
+
+    with open(path) as edge_file:
+        head = list(itertools.islice(edge_file, 10000))
+
+    if not head:
+        return 0
+
+    return os.path.getsize(path) * len(head) // max(1, sum(len(line) for line in head))
+
+
+def _write_partition_buckets(path, work_dir, num_partitions, nodetype, directed):
+    """
+    Streams the edge-list file into one unsorted bucket per partition.
+
+    Every arc u -> v is written as the record (u, v, 1) to the bucket of u and as the record
+    (v, u, 2) to the bucket of v (undirected edges get the flag 3 both ways). Lines starting
+    with # are comments and lines with fewer than two fields are skipped.
+
+    Returns:
+        The node labels in order of first appearance (node i is labels[i]).
+    """
+
+    index = {}
+    labels = []
+    forward_flag, backward_flag = (1, 2) if directed else (3, 3)
+
+    pair_files = [open(_bucket_path(work_dir, partition, "pairs"), "wb") for partition in range(num_partitions)]
+    flag_files = [open(_bucket_path(work_dir, partition, "flags"), "wb") for partition in range(num_partitions)]
+
+    try:
+        with open(path) as edge_file:
+            while True:
+                lines = list(itertools.islice(edge_file, PARSE_CHUNK_LINES))
+                if not lines:
+                    break
+
+                endpoints = []
+                for line in lines:
+                    fields = line.split("#", 1)[0].split()
+                    if len(fields) < 2:
+                        continue
+                    for label in (nodetype(fields[0]), nodetype(fields[1])):
+                        if label not in index:
+                            index[label] = len(labels)
+                            labels.append(label)
+                        endpoints.append(index[label])
+
+                if not endpoints:
+                    continue
+
+                endpoints = np.array(endpoints, dtype=np.int64).reshape(-1, 2)
+                sources = np.concatenate((endpoints[:, 0], endpoints[:, 1]))
+                targets = np.concatenate((endpoints[:, 1], endpoints[:, 0]))
+                flags = np.repeat(np.array([forward_flag, backward_flag], dtype=np.uint8), len(endpoints))
+
+                # Scatter the records to the buckets of their first node.
+                buckets = sources % num_partitions
+                for partition in np.unique(buckets).tolist():
+                    keep = buckets == partition
+                    np.column_stack((sources[keep], targets[keep])).tofile(pair_files[partition])
+                    flags[keep].tofile(flag_files[partition])
+    finally:
+        for bucket_file in pair_files + flag_files:
+            bucket_file.close()
+
+    return labels
+
+
+def _sort_partition_bucket(work_dir, partition, num_nodes):
+    """
+    Turns a bucket into the sorted, deduplicated key and flag arrays of its partition.
+    """
+
+    pairs = np.fromfile(_bucket_path(work_dir, partition, "pairs"), dtype=np.int64).reshape(-1, 2)
+    flags = np.fromfile(_bucket_path(work_dir, partition, "flags"), dtype=np.uint8)
+
+    # Self-loops never take part in a triad.
+    keep = pairs[:, 0] != pairs[:, 1]
+    keys = pairs[keep, 0] * num_nodes + pairs[keep, 1]
+    flags = flags[keep]
+    del pairs
+
+    order = np.argsort(keys, kind="mergesort")
+    keys, flags = keys[order], flags[order]
+
+    # Merge the records of the same node pair (duplicate edges and both arc directions).
+    if len(keys):
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        keys, flags = keys[starts], np.bitwise_or.reduceat(flags, starts)
+
+    np.save(_partition_path(work_dir, partition, "keys"), keys)
+    np.save(_partition_path(work_dir, partition, "flags"), flags.astype(np.uint8))
+
+    os.remove(_bucket_path(work_dir, partition, "pairs"))
+    os.remove(_bucket_path(work_dir, partition, "flags"))
+
+
+def _count_partition(partitions, partition, batch_size):
+    """
+    Counts the closed motifs found from the centers of a partition and the wedges they center.
+
+    Returns:
+        A tuple (motif_counts, wedge_counts, num_candidates) where motif_counts only holds the
+        closed motifs (6 to 12).
+    """
+
+    num_nodes = partitions.num_nodes
+    keys, flags = partitions.load(partition)
+    motif_counts = np.zeros(13, dtype=np.int64)
+
+    if len(keys) == 0:
+        return motif_counts, np.zeros(6, dtype=np.int64), 0
+
+    centers = keys // num_nodes
+    neighbors = keys % num_nodes
+
+    # Split the records into the rows of each center.
+    row_starts = np.flatnonzero(np.concatenate(([True], centers[1:] != centers[:-1])))
+    row_ends = np.append(row_starts[1:], len(keys))
+    wedge_counts = count_wedge_types(*[np.add.reduceat((flags == flag).astype(np.int64), row_starts)
+                                       for flag in (1, 2, 3)])
+
+    # Each slot whose neighbor is above its center pairs up with every later slot of its row.
+    slot_row_ends = np.repeat(row_ends, row_ends - row_starts)
+    pair_counts = np.where(neighbors > centers, slot_row_ends - np.arange(len(keys)) - 1, 0)
+    pair_ends = np.cumsum(pair_counts)
+    num_pairs = int(pair_ends[-1])
+
+    boundaries = np.searchsorted(pair_ends, np.arange(batch_size, num_pairs, batch_size), side="right")
+    boundaries = np.unique(np.concatenate(([0], boundaries, [len(keys)])))
+
+    for start, stop in zip(boundaries[:-1], boundaries[1:]):
+        counts = pair_counts[start:stop]
+        first_slots = np.repeat(np.arange(start, stop), counts)
+        second_slots = first_slots + 1 + np.arange(len(first_slots)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        # The third link of the wedge closes a triangle when the two neighbors are linked.
+        third_flags = partitions.flags_of(neighbors[first_slots], neighbors[second_slots])
+        closed = third_flags != 0
+
+        codes = (flags[first_slots[closed]].astype(np.int64) | flags[second_slots[closed]].astype(np.int64) << 2 |
+                 third_flags[closed].astype(np.int64) << 4)
+        motif_counts += np.bincount(DIRECTED_TRIAD_MOTIF_TABLE[codes], minlength=13)
+
+    return motif_counts, wedge_counts, num_pairs
+
+
+class _PartitionLookup(object):
+    """
+    Memory-maps the partitions of a graph and looks node pairs up in them.
+    """
+
+    def __init__(self, work_dir, num_nodes, num_partitions):
+        self.work_dir = work_dir
+        self.num_nodes = num_nodes
+        self.num_partitions = num_partitions
+        self._maps = {}
+
+    def load(self, partition):
+        """
+        Returns the (keys, flags) arrays of a partition, read into memory.
+        """
+
+        keys, flags = self._map(partition)
+
+        return np.array(keys), np.array(flags)
+
+    def flags_of(self, sources, targets):
+        """
+        Returns the flag byte of every node pair (0 when the nodes aren't linked).
+        """
+
+        result = np.zeros(len(sources), dtype=np.uint8)
+        buckets = sources % self.num_partitions
+
+        for partition in np.unique(buckets).tolist():
+            selected = np.flatnonzero(buckets == partition)
+            keys, flags = self._map(partition)
+            if len(keys) == 0:
+                continue
+
+            queries = sources[selected] * self.num_nodes + targets[selected]
+            positions = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+            found = keys[positions] == queries
+            result[selected[found]] = flags[positions[found]]
+
+        return result
+
+    def _map(self, partition):
+        if partition not in self._maps:
+            self._maps[partition] = (np.load(_partition_path(self.work_dir, partition, "keys"), mmap_mode="r"),
+                                     np.load(_partition_path(self.work_dir, partition, "flags"), mmap_mode="r"))
+
+        return self._maps[partition]
+
+
+def _load_checkpoint(work_dir, meta):
+    """
+    Returns the counting checkpoint of the current partitions (or an empty one).
+    """
+
+    checkpoint_path = os.path.join(work_dir, CHECKPOINT_FILE)
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint["signature"] == meta["signature"]:
+            return checkpoint
+
+    return {"signature": meta["signature"], "completed": [], "motif_counts": [0] * 13, "wedge_counts": [0] * 6}
+
+
+def _save_checkpoint(work_dir, checkpoint):
+    """
+    Writes the counting checkpoint atomically (a crash never leaves a partial checkpoint).
+    """
+
+    checkpoint_path = os.path.join(work_dir, CHECKPOINT_FILE)
+    with open(checkpoint_path + ".tmp", "w") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.rename(checkpoint_path + ".tmp", checkpoint_path)
+
+
+def _bucket_path(work_dir, partition, name):
+    return os.path.join(work_dir, "bucket_{0}_{1}.bin".format(partition, name))
+
+
+def _partition_path(work_dir, partition, name):
+    return os.path.join(work_dir, "partition_{0}_{1}.npy".format(partition, name))
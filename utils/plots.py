@@ -8,8 +8,9 @@ import networkx as nx
 import matplotlib.ticker as ticker
 from matplotlib.offsetbox import OffsetImage, AnnotationBbox
 from matplotlib._png import read_png
-from triad_motif_profile import extract_triad_motif_significance_profile, count_triad_motifs
-from networks import random_rewiring
+from triad_motif_profile import bootstrap_triad_motif_significance_profiles, count_triad_motifs, IncrementalTriadMotifCounter
+from networks import build_swap_engine
+from rewiring import MAX_PROPOSALS_PER_SWAP
 
 
 def plot_triad_motif_counts(network, title=None):
@@ -137,11 +138,11 @@ def plot_triad_motif_significance_profile(network, num_runs=20, title=None):
     X = np.arange(1, num_motifs + 1)
     plt.xticks(X)
 
-    # Iterate through the extraction instances (synonymous with each color instance).
-    for _ in range(num_runs):
+    # Compute every run's profile by resampling one shared ensemble of random instances.
+    profiles = bootstrap_triad_motif_significance_profiles(network, num_runs=num_runs)
 
-        # Run the extraction code.
-        Y = extract_triad_motif_significance_profile(network)
+    # Iterate through the extraction instances (synonymous with each color instance).
+    for Y in profiles:
 
         # Plot the y-values with straight lines connecting them.
         ax.plot(X, Y)
@@ -202,40 +203,48 @@ def plot_motif_changes_over_randomization_steps(network, colormap="rainbow", rew
     else:
         num_motifs = 2
 
-    # Count the motif before randomization.
-    starting_counts = count_triad_motifs(network)
+    # Set a hard limit on the number than can be performed.
+    rewiring_limit = rewiring_limit or 3 * nx.number_of_edges(network)
+
+    # Load the network into a swap engine and count the motifs before randomization.
+    engine = build_swap_engine(network)
+    motif_counter = IncrementalTriadMotifCounter(engine)
 
-    # Keep a history of motif counts over time.
-    motif_count_history = starting_counts
+    # Keep a history of average motif counts over time (these are our y-values), preallocated
+    # for every rewiring and seeded with the starting counts.
+    avg_motif_count_history = np.zeros(shape=(rewiring_limit + 1, num_motifs))
+    avg_motif_count_history[0] = motif_counter.motif_counts
 
-    # Keep a history of average motif counts over time (these are our y-values).
-    avg_motif_count_history = starting_counts
+    # Keep a running sum of the motif counts over time.
+    motif_count_sum = motif_counter.motif_counts.astype(float)
 
     # Keep track of how many iterations have been performed.
     num_rewirings_performed = 0
 
-    # Set a hard limit on the number than can be performed.
-    rewiring_limit = rewiring_limit or 3 * nx.number_of_edges(network)
+    # Give up if the network can't be rewired any further (swaps need at least two edges).
+    max_proposals = MAX_PROPOSALS_PER_SWAP * rewiring_limit
+    if engine.number_of_edges() < 2:
+        rewiring_limit = 0
 
-    while num_rewirings_performed < rewiring_limit:
+    while num_rewirings_performed < rewiring_limit and engine.num_proposals < max_proposals:
 
         # Randomly rewire a pair of edges in the network.
-        network = random_rewiring(network)
+        swap = engine.propose()
+        if swap is None:
+            continue
 
         # Increment the counter.
         num_rewirings_performed += 1
 
-        # Count the motifs in the slightly altered network.
-        new_motif_counts = count_triad_motifs(network)
-
-        # Add those counts to the motif history.
-        motif_count_history = np.vstack((motif_count_history, new_motif_counts))
+        # Update the motif counts from the rewired edges only.
+        new_motif_counts = motif_counter.update(*swap)
 
         # Determine the average motif counts over the current history.
-        avg_motif_counts = np.mean(motif_count_history, axis=0)   
-   
-        # Add that to the avg_motif_count_history stack of averages.
-        avg_motif_count_history = np.vstack((avg_motif_count_history, avg_motif_counts))
+        motif_count_sum += new_motif_counts
+        avg_motif_count_history[num_rewirings_performed] = motif_count_sum / (num_rewirings_performed + 1)
+
+    # Drop the rows left unused if the rewiring stopped early.
+    avg_motif_count_history = avg_motif_count_history[:num_rewirings_performed + 1]
 
     # Define x values.
     X = np.arange(num_rewirings_performed + 1)
@@ -319,17 +328,8 @@ def plot_triad_motif_significance_profiles(networks, labels, num_runs=20, title=
     # Iterate through the networks (synonymous with each color instance).
     for network, label in zip(networks, labels):
 
-        # Run the extraction code once.
-        Y = extract_triad_motif_significance_profile(network)
-
-        # Iterate through the extraction instances to compute an average.
-        for _ in range(num_runs - 1):
-
-            # Add to the counts.
-            Y += extract_triad_motif_significance_profile(network)
-
-        # Divide by the number of extractions to get the average values.
-        Y /= num_runs
+        # Average the profiles of every run, all resampled from one shared ensemble of random instances.
+        Y = np.mean(bootstrap_triad_motif_significance_profiles(network, num_runs=num_runs), axis=0)
 
         # Plot the y-values with straight lines connecting them.
         ax.plot(X, Y, label=label, linewidth=2.0)
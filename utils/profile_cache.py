@@ -0,0 +1,185 @@
+"""
+Content-addressed on-disk cache of triad motif significance profiles.
+"""
+
+import os
+import json
+import hashlib
+import weakref
+import numpy as np
+import networkx as nx
+from collections import OrderedDict
+from compact_graph import CompactGraph
+
+
+# The directory holding the cached significance profiles.
+PROFILE_CACHE_DIR = "data/.profile_cache"
+
+# The default size cap (in bytes) of the profiles kept on disk.
+PROFILE_CACHE_MAX_BYTES = 64 * 1024 ** 2
+
+# The number of profiles also kept in memory for the fastest repeat lookups.
+PROFILE_CACHE_MEMORY_ENTRIES = 1024
+
+# Digests of frozen networks (they can't change, so they are only hashed once).
+_frozen_network_digests = weakref.WeakKeyDictionary()
+
+
+def graph_digest(network):
+    """
+    Hashes the canonical edge set of a network.
+
+    The network is converted to a CompactGraph (nodes in sorted label order, duplicate edges
+    and self-loops dropped), so equal networks always share a digest whatever the order in
+    which their nodes and edges were added.
+
+    Arguments:
+        network => The input network (a networkx graph or a CompactGraph).
+
+    Returns:
+        A hexadecimal SHA-1 digest.
+    """
+
+    frozen = not isinstance(network, CompactGraph) and nx.is_frozen(network)
+    if frozen and network in _frozen_network_digests:
+        return _frozen_network_digests[network]
+
+    graph = network if isinstance(network, CompactGraph) else CompactGraph.from_networkx(network)
+    sources, targets = graph.edges()
+
+    digest = hashlib.sha1()
+    digest.update("{}:{}:".format(int(graph.directed), graph.num_nodes).encode("ascii"))
+    digest.update(np.ascontiguousarray(sources, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(targets, dtype=np.int64).tobytes())
+    digest = digest.hexdigest()
+
+    if frozen:
+        _frozen_network_digests[network] = digest
+
+    return digest
+
+
+class SignificanceProfileCache(object):
+    """
+    Stores significance profiles on disk under a key derived from the network's canonical edge
+    set and the parameters (including the engine version) that produced them.
+
+    Any change to the graph or to the algorithm yields a new key, so stale entries are never
+    returned; they simply age out. When the profiles on disk exceed the size cap, the least
+    recently used ones are deleted. Recent profiles are also kept in memory.
+
+    Attributes:
+        cache_dir => The directory holding the cached profiles.
+        max_bytes => The size cap (in bytes) of the profiles kept on disk.
+    """
+
+    def __init__(self, cache_dir=PROFILE_CACHE_DIR, max_bytes=PROFILE_CACHE_MAX_BYTES):
+        """
+        Arguments:
+            cache_dir => The directory holding the cached profiles.
+            max_bytes => The size cap (in bytes) of the profiles kept on disk.
+        """
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+
+    def make_key(self, network, **params):
+        """
+        Builds the cache key of a network and the parameters of a profile computation.
+
+        Arguments:
+            network => The input network (a networkx graph or a CompactGraph).
+            params => The parameters that determine the profile (JSON-serializable values).
+
+        Returns:
+            A hexadecimal key.
+        """
+
+        params = json.dumps(params, sort_keys=True)
+
+        return hashlib.sha1((graph_digest(network) + params).encode("ascii")).hexdigest()
+
+    def get(self, key):
+        """
+        Returns a copy of the cached profile stored under key (or None when missing).
+        """
+
+        if key in self._memory:
+            profile = self._memory.pop(key)
+            self._memory[key] = profile
+            return profile.copy()
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+
+        profile = np.load(path)
+
+        # Refresh the modification time, which orders the entries for eviction.
+        os.utime(path, None)
+        self._remember(key, profile)
+
+        return profile.copy()
+
+    def put(self, key, profile):
+        """
+        Stores a profile under key and evicts the least recently used entries if needed.
+        """
+
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        # Write to a temporary file first so readers never see a partial profile.
+        path = self._path(key)
+        temporary_path = path + ".tmp.npy"
+        np.save(temporary_path, profile)
+        os.rename(temporary_path, path)
+
+        self._remember(key, np.array(profile))
+        self._evict()
+
+    def clear(self):
+        """
+        Deletes every cached profile.
+        """
+
+        self._memory.clear()
+        for path in self._entry_paths():
+            os.remove(path)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".npy")
+
+    def _entry_paths(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                if name.endswith(".npy") and not name.endswith(".tmp.npy")]
+
+    def _remember(self, key, profile):
+        """
+        Keeps a profile in memory, dropping the least recently used ones beyond the limit.
+        """
+
+        self._memory.pop(key, None)
+        self._memory[key] = profile
+
+        while len(self._memory) > PROFILE_CACHE_MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """
+        Deletes the least recently used profiles until the cache fits within max_bytes.
+        """
+
+        entries = sorted((os.path.getmtime(path), os.path.getsize(path), path) for path in self._entry_paths())
+        total_bytes = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            self._memory.pop(os.path.basename(path)[:-len(".npy")], None)
+            total_bytes -= size
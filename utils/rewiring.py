@@ -0,0 +1,708 @@
+"""
+Degree-preserving edge swap engine used to randomize networks.
+"""
+
+import numpy as np
+
+
+# The number of swap proposals allowed per requested swap before giving up (guards
+# against networks where almost no swap is possible).
+MAX_PROPOSALS_PER_SWAP = 100
+
+# The number of random edge index pairs drawn from the generator at once.
+PROPOSAL_BLOCK_SIZE = 4096
+
+# The number of swaps proposed per batch by run_batched, as a fraction of the number of edges
+# (larger batches lose more proposals to collisions between swaps of the same batch).
+SWAP_BATCH_FRACTION = 0.1
+
+# The number of swaps between two mixing checks, as a fraction of the number of edges.
+MIXING_WINDOW_FRACTION = 0.1
+
+# The largest change (between two checks) of the fraction of original edges still present, and
+# of each count of the tracked statistic relative to its size, for the edges to count as mixed.
+MIXING_EDGE_TOLERANCE = 0.01
+MIXING_STATISTIC_TOLERANCE = 0.05
+
+# The number of standard deviations a count may change by (treating it as Poisson) before the
+# change is attributed to the swaps rather than to random fluctuations.
+MIXING_NOISE_DEVIATIONS = 2
+
+# The number of consecutive stable checks required before stopping.
+MIXING_STABLE_WINDOWS = 3
+
+# The largest number of swaps per edge performed while waiting for the edges to mix.
+MAX_MIXING_SWAPS_PER_EDGE = 10
+
+
+class EdgeSwapEngine(object):
+    """
+    Rewires an edge array in place while preserving every node's degree(s).
+
+    The edges are kept as two parallel lists of integer node indices plus a hash set of
+    edge keys, so a swap is proposed by sampling two random edge indices, a collision
+    with an existing edge is rejected with a single set lookup, and an accepted swap
+    only touches two list entries and four set entries.
+
+    Attributes:
+        sources, targets => Lists of the current edge endpoints (node indices).
+        directed => Whether or not the edges are directed.
+        num_nodes => The number of nodes (node indices lie in 0..num_nodes-1).
+        num_proposals => The number of swaps proposed so far.
+        num_swaps => The number of swaps accepted so far.
+    """
+
+    def __init__(self, sources, targets, num_nodes, directed=True, seed=None):
+        """
+        Arguments:
+            sources => A sequence of edge source node indices.
+            targets => A sequence of edge target node indices.
+            num_nodes => The number of nodes in the network.
+            directed => Whether or not the edges are directed.
+            seed => A seed for the engine's random number generator.
+        """
+
+        self.sources = [int(node) for node in sources]
+        self.targets = [int(node) for node in targets]
+        self.num_nodes = int(num_nodes)
+        self.directed = directed
+        self.num_proposals = 0
+        self.num_swaps = 0
+        self._random = np.random.RandomState(seed)
+        self._edge_keys = set(self._key(u, v) for u, v in zip(self.sources, self.targets))
+
+    def _key(self, u, v):
+        """
+        Encodes an edge as a single integer (undirected edges ignore orientation).
+        """
+
+        if not self.directed and u > v:
+            u, v = v, u
+
+        return u * self.num_nodes + v
+
+    def _keys_of(self, sources, targets):
+        """
+        Vectorized version of _key for arrays of sources and targets.
+        """
+
+        if not self.directed:
+            sources, targets = np.minimum(sources, targets), np.maximum(sources, targets)
+
+        return sources * self.num_nodes + targets
+
+    def has_edge(self, u, v):
+        return self._key(u, v) in self._edge_keys
+
+    def has_edges(self, sources, targets):
+        """
+        Vectorized version of has_edge for arrays of sources and targets (one hash set lookup
+        per pair).
+        """
+
+        keys = self._keys_of(np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64))
+        edge_keys = self._edge_keys
+
+        return np.fromiter((key in edge_keys for key in keys.tolist()), dtype=bool, count=len(keys))
+
+    def number_of_edges(self):
+        return len(self._edge_keys)
+
+    def edges(self):
+        """
+        Returns the current (sources, targets) node index arrays.
+        """
+
+        return np.array(self.sources, dtype=np.int64), np.array(self.targets, dtype=np.int64)
+
+    def try_swap(self, i, j, flip=False):
+        """
+        Tries to rewire edges i (A-B) and j (C-D) to A-D and C-B (or to A-C and B-D when
+        flip is set, which is only valid for undirected edges).
+
+        Arguments:
+            i, j => The indices of the two edges.
+            flip => Whether to use the alternative rewiring of undirected edges.
+
+        Returns:
+            A tuple (removed, added) holding the two removed and the two added edges, or
+            None when the swap was rejected.
+        """
+
+        self.num_proposals += 1
+
+        sources, targets = self.sources, self.targets
+        source1, target1 = sources[i], targets[i]
+        source2, target2 = sources[j], targets[j]
+
+        # Both edges must be distinct and share no nodes.
+        if source1 == source2 or source1 == target2 or target1 == source2 or target1 == target2:
+            return None
+
+        if flip and not self.directed:
+            new_link1 = (source1, source2)
+            new_link2 = (target1, target2)
+        else:
+            new_link1 = (source1, target2)
+            new_link2 = (source2, target1)
+
+        # Reject the swap if either new edge already exists.
+        new_key1 = self._key(*new_link1)
+        new_key2 = self._key(*new_link2)
+        if new_key1 in self._edge_keys or new_key2 in self._edge_keys:
+            return None
+
+        # Replace the old edges with the new edges.
+        self._edge_keys.difference_update((self._key(source1, target1), self._key(source2, target2)))
+        self._edge_keys.update((new_key1, new_key2))
+        sources[i], targets[i] = new_link1
+        sources[j], targets[j] = new_link2
+
+        self.num_swaps += 1
+
+        return ((source1, target1), (source2, target2)), (new_link1, new_link2)
+
+    def propose(self):
+        """
+        Proposes a single swap between two uniformly chosen edges.
+
+        Returns:
+            The result of try_swap for the proposal.
+        """
+
+        num_edges = len(self.sources)
+
+        # Swaps need at least two edges.
+        if num_edges < 2:
+            return None
+
+        i, j = self._random.randint(0, num_edges, size=2)
+
+        return self.try_swap(i, j, flip=self._random.random_sample() < 0.5)
+
+    def run(self, num_swaps, max_proposals=None):
+        """
+        Performs swaps until num_swaps have been accepted.
+
+        Arguments:
+            num_swaps => The number of swaps to perform.
+            max_proposals => An upper bound on the number of proposals (default set to
+            MAX_PROPOSALS_PER_SWAP times num_swaps).
+
+        Returns:
+            The number of swaps actually performed.
+        """
+
+        num_edges = len(self.sources)
+
+        # Swaps need at least two edges.
+        if num_edges < 2:
+            return 0
+
+        max_proposals = max_proposals or MAX_PROPOSALS_PER_SWAP * num_swaps
+        swaps_left = num_swaps
+        proposals_left = max_proposals
+
+        # Bind the hot-path state to locals (this loop inlines try_swap).
+        sources, targets, edge_keys = self.sources, self.targets, self._edge_keys
+        num_nodes, directed = self.num_nodes, self.directed
+
+        while swaps_left > 0 and proposals_left > 0:
+
+            # Draw a block of proposals at once to avoid per-proposal generator calls.
+            block_size = min(PROPOSAL_BLOCK_SIZE, proposals_left)
+            pairs = self._random.randint(0, num_edges, size=(block_size, 2)).tolist()
+            flips = (self._random.random_sample(block_size) < 0.5).tolist()
+
+            for (i, j), flip in zip(pairs, flips):
+                proposals_left -= 1
+
+                source1, target1 = sources[i], targets[i]
+                source2, target2 = sources[j], targets[j]
+
+                # Both edges must be distinct and share no nodes.
+                if source1 == source2 or source1 == target2 or target1 == source2 or target1 == target2:
+                    continue
+
+                if flip and not directed:
+                    new_source1, new_target1, new_source2, new_target2 = source1, source2, target1, target2
+                else:
+                    new_source1, new_target1, new_source2, new_target2 = source1, target2, source2, target1
+
+                if directed:
+                    old_key1 = source1 * num_nodes + target1
+                    old_key2 = source2 * num_nodes + target2
+                    new_key1 = new_source1 * num_nodes + new_target1
+                    new_key2 = new_source2 * num_nodes + new_target2
+                else:
+                    old_key1 = self._key(source1, target1)
+                    old_key2 = self._key(source2, target2)
+                    new_key1 = self._key(new_source1, new_target1)
+                    new_key2 = self._key(new_source2, new_target2)
+
+                # Reject the swap if either new edge already exists.
+                if new_key1 in edge_keys or new_key2 in edge_keys:
+                    continue
+
+                # Replace the old edges with the new edges.
+                edge_keys.remove(old_key1)
+                edge_keys.remove(old_key2)
+                edge_keys.add(new_key1)
+                edge_keys.add(new_key2)
+                sources[i], targets[i] = new_source1, new_target1
+                sources[j], targets[j] = new_source2, new_target2
+
+                swaps_left -= 1
+                if swaps_left == 0:
+                    break
+
+        self.num_proposals += max_proposals - proposals_left
+        self.num_swaps += num_swaps - swaps_left
+
+        return num_swaps - swaps_left
+
+    def run_batched(self, num_swaps, max_proposals=None, batch_size=None):
+        """
+        Performs swaps until num_swaps have been accepted, proposing and applying a whole batch
+        of swaps at a time with array operations instead of one swap per interpreter step.
+
+        Within a batch, the swaps sharing a node between their two edges are dropped, then every
+        swap touching an edge already used by an earlier swap of the batch, then every swap
+        creating an edge that already exists (before the batch) or that another swap of the batch
+        also creates. The remaining swaps touch disjoint edges and create distinct new edges, so
+        applying them all at once preserves the degrees and never creates duplicate edges. The
+        swaps differ from those of run (and proposals are lost to collisions), but each batch is
+        a valid sequence of swaps.
+
+        Arguments:
+            num_swaps => The number of swaps to perform.
+            max_proposals => An upper bound on the number of proposals (default set to
+            MAX_PROPOSALS_PER_SWAP times num_swaps).
+            batch_size => The number of swaps proposed per batch (default set to
+            SWAP_BATCH_FRACTION times the number of edges).
+
+        Returns:
+            The number of swaps actually performed.
+        """
+
+        num_edges = len(self.sources)
+
+        # Swaps need at least two edges.
+        if num_edges < 2:
+            return 0
+
+        max_proposals = max_proposals or MAX_PROPOSALS_PER_SWAP * num_swaps
+        batch_size = batch_size or max(1, int(SWAP_BATCH_FRACTION * num_edges))
+        swaps_left = num_swaps
+        proposals_left = max_proposals
+
+        sources = np.array(self.sources, dtype=np.int64)
+        targets = np.array(self.targets, dtype=np.int64)
+        keys = np.sort(self._keys_of(sources, targets))
+
+        while swaps_left > 0 and proposals_left > 0:
+
+            size = min(batch_size, proposals_left)
+            proposals_left -= size
+
+            first, second = self._random.randint(0, num_edges, size=(2, size))
+            source1, target1 = sources[first], targets[first]
+            source2, target2 = sources[second], targets[second]
+
+            # Both edges must be distinct and share no nodes.
+            valid = (source1 != source2) & (source1 != target2) & (target1 != source2) & (target1 != target2)
+
+            # The new edges are A-D and C-B (undirected edges may also become A-C and B-D).
+            new_target1, new_source2, new_target2 = target2.copy(), source2.copy(), target1.copy()
+            if not self.directed:
+                flips = self._random.random_sample(size) < 0.5
+                new_target1[flips] = source2[flips]
+                new_source2[flips] = target1[flips]
+                new_target2[flips] = target2[flips]
+
+            # Keep the first swap of the batch using each edge.
+            valid_positions = np.flatnonzero(valid)
+            edge_uses = np.column_stack((first[valid_positions], second[valid_positions])).ravel()
+            _, first_uses = np.unique(edge_uses, return_index=True)
+            is_first_use = np.zeros(len(edge_uses), dtype=bool)
+            is_first_use[first_uses] = True
+            valid_positions = valid_positions[is_first_use.reshape(-1, 2).all(axis=1)]
+
+            # Reject the swaps creating an existing edge or an edge created twice in the batch.
+            new_keys = np.concatenate((self._keys_of(source1[valid_positions], new_target1[valid_positions]),
+                                       self._keys_of(new_source2[valid_positions], new_target2[valid_positions])))
+            unique_keys, inverse, key_counts = np.unique(new_keys, return_inverse=True, return_counts=True)
+            fresh = ((key_counts == 1) & ~_sorted_contains(keys, unique_keys))[inverse]
+            fresh = fresh.reshape(2, -1).all(axis=0)
+            accepted = valid_positions[fresh][:swaps_left]
+            new_keys = new_keys.reshape(2, -1)[:, fresh][:, :swaps_left].ravel()
+
+            if len(accepted) == 0:
+                continue
+
+            # Apply the surviving swaps at once.
+            old_keys = self._keys_of(np.concatenate((source1[accepted], source2[accepted])),
+                                     np.concatenate((target1[accepted], target2[accepted])))
+            keys = np.delete(keys, np.searchsorted(keys, np.sort(old_keys)))
+            new_keys = np.sort(new_keys)
+            keys = np.insert(keys, np.searchsorted(keys, new_keys), new_keys)
+
+            first_edges, second_edges = first[accepted], second[accepted]
+            sources[second_edges], targets[second_edges] = new_source2[accepted], new_target2[accepted]
+            targets[first_edges] = new_target1[accepted]
+
+            swaps_left -= len(accepted)
+
+        # Write the swapped edges back into the scalar state.
+        self.sources[:] = sources.tolist()
+        self.targets[:] = targets.tolist()
+        self._edge_keys.clear()
+        self._edge_keys.update(keys.tolist())
+
+        self.num_proposals += max_proposals - proposals_left
+        self.num_swaps += num_swaps - swaps_left
+
+        return num_swaps - swaps_left
+
+    def run_until_mixed(self, statistic=None, window=None, edge_tolerance=MIXING_EDGE_TOLERANCE,
+                        statistic_tolerance=MIXING_STATISTIC_TOLERANCE, stable_windows=MIXING_STABLE_WINDOWS,
+                        max_swaps=None, batched=False):
+        """
+        Performs swaps until the edges have mixed, instead of a fixed number of swaps.
+
+        Every window of swaps, the fraction of the starting edges still present is measured (it
+        decays towards the overlap expected by chance). Once it has changed by at most
+        edge_tolerance for stable_windows checks in a row, the optional statistic (such as the
+        motif counts, which cost far more to measure) confirms the mixing: the edges count as
+        mixed when every one of its counts changed by at most statistic_tolerance of its size
+        beyond its Poisson fluctuations since its previous measurement. Each failed confirmation doubles the
+        number of swaps before the next one, so the statistic is measured O(log(max_swaps))
+        times at most. Small networks therefore stop early while large ones keep swapping, up to
+        max_swaps.
+
+        Arguments:
+            statistic => An optional function taking the engine and returning a vector of counts
+            (e.g. the motif counts of its current edges).
+            window => The number of swaps between two checks of the edges (and between the
+            first two measurements of the statistic; default set to MIXING_WINDOW_FRACTION
+            times the number of edges).
+            edge_tolerance => The largest change of the fraction of starting edges still present.
+            statistic_tolerance => The largest relative change of each count of the statistic.
+            stable_windows => The number of consecutive stable checks of the edges required.
+            max_swaps => The largest number of swaps performed (default set to
+            MAX_MIXING_SWAPS_PER_EDGE times the number of edges).
+            batched => Whether to perform the swaps with run_batched.
+
+        Returns:
+            A dictionary with the 'num_swaps' performed, the final 'original_edge_fraction',
+            the 'num_checks' of the edges and 'num_statistic_checks' made, and whether the edges
+            'mixed' before max_swaps.
+        """
+
+        num_edges = self.number_of_edges()
+        window = window or max(1, int(MIXING_WINDOW_FRACTION * num_edges))
+        max_swaps = max_swaps or MAX_MIXING_SWAPS_PER_EDGE * num_edges
+
+        original_keys = frozenset(self._edge_keys)
+        edge_fraction = 1.0
+
+        num_swaps = 0
+        num_checks = 0
+        num_stable = 0
+        run = self.run_batched if batched else self.run
+
+        # The statistic is first measured once the edges look mixed.
+        values = None
+        num_statistic_checks = 0
+        statistic_interval = window
+        next_statistic_check = None
+        mixed = False
+
+        while num_swaps < max_swaps:
+            performed = run(min(window, max_swaps - num_swaps))
+            num_swaps += performed
+            num_checks += 1
+
+            # The network can't be rewired any further.
+            if performed == 0:
+                break
+
+            previous_fraction, edge_fraction = edge_fraction, len(self._edge_keys & original_keys) / float(num_edges)
+            num_stable = num_stable + 1 if abs(edge_fraction - previous_fraction) <= edge_tolerance else 0
+
+            if num_stable < stable_windows:
+                continue
+
+            if statistic is None:
+                mixed = True
+                break
+
+            if next_statistic_check is not None and num_swaps < next_statistic_check:
+                continue
+
+            previous_values, values = values, np.asarray(statistic(self), dtype=float)
+            num_statistic_checks += 1
+
+            # Every count must hold still on its own (rare counts would drown in a summed test).
+            if previous_values is not None:
+                previous_sizes = np.abs(previous_values)
+                noise = MIXING_NOISE_DEVIATIONS * np.sqrt(np.maximum(previous_sizes, 1))
+                allowed = statistic_tolerance * previous_sizes + noise
+                if np.all(np.abs(values - previous_values) <= allowed):
+                    mixed = True
+                    break
+                statistic_interval *= 2
+
+            next_statistic_check = num_swaps + statistic_interval
+
+        return {"num_swaps": num_swaps, "original_edge_fraction": edge_fraction, "num_checks": num_checks,
+                "num_statistic_checks": num_statistic_checks, "mixed": mixed}
+
+
+def _sorted_contains(sorted_keys, keys):
+    """
+    Tests which of the keys are present in a sorted key array.
+    """
+
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=bool)
+
+    positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+
+    return sorted_keys[positions] == keys
+
+
+class DyadSwapEngine(EdgeSwapEngine):
+    """
+    Rewires directed edges while preserving every node's single out-, single in- and mutual
+    degrees (the number of arcs without a reverse arc, and of nodes linked in both directions).
+
+    The arcs are split into single arcs and mutual dyads. A swap rewires either two single arcs
+    (A -> B, C -> D) into (A -> D, C -> B), or two mutual dyads (A <-> B, C <-> D) into
+    (A <-> D, C <-> B) or (A <-> C, B <-> D), and is rejected whenever a new link would meet an
+    existing arc in either direction, so single arcs never become mutual and mutual dyads are
+    never broken up. Each kind of swap is proposed in proportion to its number of links, and
+    every proposal costs O(1) set lookups.
+
+    Attributes:
+        sources, targets => Lists of the current single arc endpoints (node indices).
+        mutual_sources, mutual_targets => Lists of the current mutual dyad endpoints (each dyad
+        is listed once).
+        num_nodes, num_proposals, num_swaps => See EdgeSwapEngine.
+    """
+
+    def __init__(self, sources, targets, num_nodes, seed=None):
+        """
+        Arguments:
+            sources => A sequence of arc source node indices.
+            targets => A sequence of arc target node indices.
+            num_nodes => The number of nodes in the network.
+            seed => A seed for the engine's random number generator.
+        """
+
+        num_nodes = int(num_nodes)
+        arcs = set((int(u), int(v)) for u, v in zip(sources, targets))
+
+        # An arc is mutual when its reverse arc exists (self-loops are kept as single arcs).
+        single_arcs = sorted((u, v) for u, v in arcs if u == v or (v, u) not in arcs)
+        mutual_dyads = sorted((u, v) for u, v in arcs if u < v and (v, u) in arcs)
+
+        EdgeSwapEngine.__init__(self, [u for u, _ in single_arcs], [v for _, v in single_arcs], num_nodes,
+                                directed=True, seed=seed)
+
+        self.mutual_sources = [u for u, _ in mutual_dyads]
+        self.mutual_targets = [v for _, v in mutual_dyads]
+        self._edge_keys.update(u * num_nodes + v for u, v in mutual_dyads)
+        self._edge_keys.update(v * num_nodes + u for u, v in mutual_dyads)
+
+    def edges(self):
+        """
+        Returns the current (sources, targets) node index arrays of all arcs (both arcs of
+        every mutual dyad included).
+        """
+
+        sources = self.sources + self.mutual_sources + self.mutual_targets
+        targets = self.targets + self.mutual_targets + self.mutual_sources
+
+        return np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64)
+
+    def try_swap(self, i, j, flip=False, mutual=False):
+        """
+        Tries to rewire single arcs i (A -> B) and j (C -> D) to A -> D and C -> B, or mutual
+        dyads i (A <-> B) and j (C <-> D) to A <-> D and C <-> B (A <-> C and B <-> D when flip
+        is set).
+
+        Arguments:
+            i, j => The indices of the two single arcs (or mutual dyads).
+            flip => Whether to use the alternative rewiring of mutual dyads.
+            mutual => Whether i and j index mutual dyads rather than single arcs.
+
+        Returns:
+            A tuple (removed, added) holding the removed and the added arcs, or None when the
+            swap was rejected.
+        """
+
+        self.num_proposals += 1
+
+        sources, targets = (self.mutual_sources, self.mutual_targets) if mutual else (self.sources, self.targets)
+        source1, target1 = sources[i], targets[i]
+        source2, target2 = sources[j], targets[j]
+
+        # Both links must be distinct and share no nodes.
+        if source1 == source2 or source1 == target2 or target1 == source2 or target1 == target2:
+            return None
+
+        if flip and mutual:
+            new_link1 = (source1, source2)
+            new_link2 = (target1, target2)
+        else:
+            new_link1 = (source1, target2)
+            new_link2 = (source2, target1)
+
+        # Reject the swap if the new node pairs are already linked in either direction.
+        new_keys = [u * self.num_nodes + v for u, v in (new_link1, new_link2)]
+        reverse_keys = [v * self.num_nodes + u for u, v in (new_link1, new_link2)]
+        if any(key in self._edge_keys for key in new_keys + reverse_keys):
+            return None
+
+        removed = [(source1, target1), (source2, target2)]
+        added = [new_link1, new_link2]
+
+        # Mutual dyads rewire both of their arcs.
+        if mutual:
+            removed += [(v, u) for u, v in removed]
+            added += [(v, u) for u, v in added]
+            new_keys += reverse_keys
+
+        self._edge_keys.difference_update(u * self.num_nodes + v for u, v in removed)
+        self._edge_keys.update(new_keys)
+        sources[i], targets[i] = new_link1
+        sources[j], targets[j] = new_link2
+
+        self.num_swaps += 1
+
+        return tuple(removed), tuple(added)
+
+    def propose(self):
+        """
+        Proposes a single swap between two uniformly chosen single arcs or mutual dyads.
+
+        Returns:
+            The result of try_swap for the proposal.
+        """
+
+        single_weight, mutual_weight = self._kind_weights()
+
+        # Swaps need at least two links of the same kind.
+        if single_weight + mutual_weight == 0:
+            return None
+
+        mutual = self._random.random_sample() * (single_weight + mutual_weight) >= single_weight
+        num_links = len(self.mutual_sources) if mutual else len(self.sources)
+        i, j = self._random.randint(0, num_links, size=2)
+
+        return self.try_swap(i, j, flip=self._random.random_sample() < 0.5, mutual=mutual)
+
+    def _kind_weights(self):
+        """
+        Returns the proposal weights of single arc and mutual dyad swaps (the number of links
+        of each kind, or 0 when there are too few to swap).
+        """
+
+        num_single, num_mutual = len(self.sources), len(self.mutual_sources)
+
+        return (num_single if num_single >= 2 else 0), (num_mutual if num_mutual >= 2 else 0)
+
+    def run(self, num_swaps, max_proposals=None):
+        """
+        Performs swaps until num_swaps have been accepted.
+
+        Arguments:
+            num_swaps => The number of swaps to perform.
+            max_proposals => An upper bound on the number of proposals (default set to
+            MAX_PROPOSALS_PER_SWAP times num_swaps).
+
+        Returns:
+            The number of swaps actually performed.
+        """
+
+        single_weight, mutual_weight = self._kind_weights()
+
+        # Swaps need at least two links of the same kind.
+        if single_weight + mutual_weight == 0:
+            return 0
+
+        mutual_threshold = single_weight / float(single_weight + mutual_weight)
+        max_proposals = max_proposals or MAX_PROPOSALS_PER_SWAP * num_swaps
+        swaps_left = num_swaps
+        proposals_left = max_proposals
+
+        # Bind the hot-path state to locals (this loop inlines try_swap).
+        links = {False: (self.sources, self.targets, len(self.sources)),
+                 True: (self.mutual_sources, self.mutual_targets, len(self.mutual_sources))}
+        edge_keys, num_nodes = self._edge_keys, self.num_nodes
+
+        while swaps_left > 0 and proposals_left > 0:
+
+            # Draw a block of proposals at once: the kind, both link positions and the flip.
+            block_size = min(PROPOSAL_BLOCK_SIZE, proposals_left)
+            draws = self._random.random_sample((block_size, 4)).tolist()
+
+            for kind_draw, i_draw, j_draw, flip_draw in draws:
+                proposals_left -= 1
+
+                mutual = kind_draw >= mutual_threshold
+                sources, targets, num_links = links[mutual]
+                i, j = int(i_draw * num_links), int(j_draw * num_links)
+
+                source1, target1 = sources[i], targets[i]
+                source2, target2 = sources[j], targets[j]
+
+                # Both links must be distinct and share no nodes.
+                if source1 == source2 or source1 == target2 or target1 == source2 or target1 == target2:
+                    continue
+
+                if mutual and flip_draw < 0.5:
+                    new_source1, new_target1, new_source2, new_target2 = source1, source2, target1, target2
+                else:
+                    new_source1, new_target1, new_source2, new_target2 = source1, target2, source2, target1
+
+                new_key1 = new_source1 * num_nodes + new_target1
+                new_key2 = new_source2 * num_nodes + new_target2
+                reverse_key1 = new_target1 * num_nodes + new_source1
+                reverse_key2 = new_target2 * num_nodes + new_source2
+
+                # Reject the swap if the new node pairs are already linked in either direction.
+                if (new_key1 in edge_keys or new_key2 in edge_keys or reverse_key1 in edge_keys or
+                        reverse_key2 in edge_keys):
+                    continue
+
+                # Replace the old links with the new links (both arcs of mutual dyads).
+                edge_keys.remove(source1 * num_nodes + target1)
+                edge_keys.remove(source2 * num_nodes + target2)
+                edge_keys.add(new_key1)
+                edge_keys.add(new_key2)
+                if mutual:
+                    edge_keys.remove(target1 * num_nodes + source1)
+                    edge_keys.remove(target2 * num_nodes + source2)
+                    edge_keys.add(reverse_key1)
+                    edge_keys.add(reverse_key2)
+                sources[i], targets[i] = new_source1, new_target1
+                sources[j], targets[j] = new_source2, new_target2
+
+                swaps_left -= 1
+                if swaps_left == 0:
+                    break
+
+        self.num_proposals += max_proposals - proposals_left
+        self.num_swaps += num_swaps - swaps_left
+
+        return num_swaps - swaps_left
+
+    def run_batched(self, num_swaps, max_proposals=None, batch_size=None):
+        """
+        Performs swaps until num_swaps have been accepted (with the scalar loop of run, since
+        the batched swaps of EdgeSwapEngine don't keep single arcs and mutual dyads apart).
+        """
+
+        return self.run(num_swaps, max_proposals=max_proposals)
@@ -2,16 +2,44 @@
 Functions for computing execution time complexity.
 """
 
+import os
+import sys
+import json
 import time
+import shutil
+import platform
+import argparse
+import tempfile
+import itertools
 import numpy as np
 import networkx as nx
-from triad_motif_profile import count_triad_motifs
-from networks import build_erdos_renyi_network
+from triad_motif_profile import count_triad_motifs, compute_normalized_triad_motif_z_scores
+from networks import (DATASETS, build_erdos_renyi_network, build_swap_engine, load_edge_list_network,
+                      randomize)
+from instrumentation import clock
+
+
+# The stages of the pipeline timed by the benchmark suite.
+# load => Parsing an edge-list file into a network (with the binary graph cache disabled).
+# count => Counting the triad motifs of the network.
+# rewiring => A single degree-preserving edge swap (averaged over a block of swaps).
+# randomize => Fully randomizing the network.
+# z_scores => Computing the normalized triad motif z-scores end to end.
+BENCHMARK_STAGES = ("load", "count", "rewiring", "randomize", "z_scores")
+
+# The number of swaps timed together when measuring a single rewiring.
+REWIRING_BLOCK_SIZE = 1000
+
+# The relative slowdown (against a baseline) above which a stage is flagged as a regression.
+REGRESSION_TOLERANCE = 0.25
+
+# Timings below this many seconds are too noisy to be flagged as regressions.
+REGRESSION_MIN_SECONDS = 1e-3
 
 
 def compute_count_execution_time(n=300, p=0.5, directed=False, num_iterations=10):
     """
-    Computes the average execution time (in seconds) of the triad motif counting 
+    Computes the average execution time (in seconds) of the triad motif counting
     function on a random network of size n and connection probability p.
 
     Arguments:
@@ -49,3 +77,299 @@ def compute_count_execution_time(n=300, p=0.5, directed=False, num_iterations=10
 
     return report
 
+
+def time_function(function, num_iterations=3, scale=1):
+    """
+    Times repeated calls of a function.
+
+    Arguments:
+        function => A function taking no arguments.
+        num_iterations => The number of timed calls.
+        scale => The number of operations performed per call (every time is divided by it).
+
+    Returns:
+        A dictionary with the 'min', 'median' and 'mean' time (in seconds) and the list of
+        all 'times'.
+    """
+
+    times = []
+    for _ in range(num_iterations):
+        start_time = clock()
+        function()
+        times.append((clock() - start_time) / scale)
+
+    return {"min": min(times), "median": float(np.median(times)), "mean": float(np.mean(times)),
+            "times": times}
+
+
+def benchmark_network(network, path=None, nodetype=int, stages=BENCHMARK_STAGES, num_iterations=3,
+                      num_rand_instances=5, seed=0):
+    """
+    Times every requested stage of the pipeline on a single network.
+
+    Arguments:
+        network => The input network.
+        path => The edge-list file the network is loaded from (the network is written to a
+        temporary file when omitted).
+        nodetype => The type of the node labels in the edge-list file.
+        stages => The stages to time (see BENCHMARK_STAGES).
+        num_iterations => The number of timed calls per stage.
+        num_rand_instances => The number of random instances used by the z_scores stage.
+        seed => A seed for the randomized stages.
+
+    Returns:
+        A dictionary mapping each stage to its timings (see time_function).
+    """
+
+    directed = network.is_directed()
+    timings = {}
+
+    if "load" in stages:
+        temporary_dir = None
+        if path is None:
+            temporary_dir = tempfile.mkdtemp()
+            path = os.path.join(temporary_dir, "network.txt")
+            nx.write_edgelist(network, path, data=False)
+        try:
+            timings["load"] = time_function(
+                lambda: load_edge_list_network(path, nodetype=nodetype, directed=directed, cache_dir=None),
+                num_iterations)
+        finally:
+            if temporary_dir is not None:
+                shutil.rmtree(temporary_dir)
+
+    if "count" in stages:
+        timings["count"] = time_function(lambda: count_triad_motifs(network, directed=directed), num_iterations)
+
+    if "rewiring" in stages:
+        engine = build_swap_engine(network, seed=seed)
+        timings["rewiring"] = time_function(lambda: engine.run(REWIRING_BLOCK_SIZE), num_iterations,
+                                            scale=REWIRING_BLOCK_SIZE)
+
+    if "randomize" in stages:
+        timings["randomize"] = time_function(lambda: randomize(network, seed=seed), num_iterations)
+
+    if "z_scores" in stages:
+        timings["z_scores"] = time_function(
+            lambda: compute_normalized_triad_motif_z_scores(network, num_rand_instances=num_rand_instances,
+                                                            seed=seed),
+            num_iterations)
+
+    return timings
+
+
+def run_benchmark_suite(sizes=(100, 200, 400), densities=(0.02, 0.05), directed=(False, True),
+                        datasets=(), stages=BENCHMARK_STAGES, num_iterations=3, num_rand_instances=5,
+                        seed=0):
+    """
+    Times the pipeline on a sweep of random Erdos-Renyi networks and on shipped datasets.
+
+    Arguments:
+        sizes => The network sizes (number of nodes) swept.
+        densities => The connection probabilities swept.
+        directed => The directedness values swept.
+        datasets => The names of the shipped datasets to time (see networks.DATASETS).
+        stages => The stages to time (see BENCHMARK_STAGES).
+        num_iterations => The number of timed calls per stage.
+        num_rand_instances => The number of random instances used by the z_scores stage.
+        seed => A seed for the random networks and the randomized stages.
+
+    Returns:
+        A JSON-serializable dictionary holding the 'environment', the 'parameters', one record
+        per network under 'results' and the fitted 'scaling_exponents' (see fit_scaling_exponents).
+    """
+
+    results = []
+
+    for n, p, is_directed in itertools.product(sizes, densities, directed):
+        network = nx.erdos_renyi_graph(n, p, seed=seed, directed=is_directed)
+        record = {"name": "erdos_renyi(n={0}, p={1}, directed={2})".format(n, p, is_directed),
+                  "kind": "synthetic", "n": n, "p": p, "directed": is_directed,
+                  "num_edges": network.number_of_edges()}
+        record["stages"] = benchmark_network(network, stages=stages, num_iterations=num_iterations,
+                                             num_rand_instances=num_rand_instances, seed=seed)
+        results.append(record)
+
+    for name in datasets:
+        path, is_directed, nodetype = DATASETS[name]
+        network = load_edge_list_network(path, nodetype=nodetype, directed=is_directed, cache_dir=None)
+        record = {"name": name, "kind": "dataset", "n": network.number_of_nodes(), "p": None,
+                  "directed": is_directed, "num_edges": network.number_of_edges()}
+        record["stages"] = benchmark_network(network, path=path, nodetype=nodetype, stages=stages,
+                                             num_iterations=num_iterations,
+                                             num_rand_instances=num_rand_instances, seed=seed)
+        results.append(record)
+
+    return {"environment": {"python": platform.python_version(), "numpy": np.__version__,
+                            "networkx": nx.__version__, "platform": platform.platform()},
+            "parameters": {"num_iterations": num_iterations, "num_rand_instances": num_rand_instances,
+                           "seed": seed},
+            "results": results,
+            "scaling_exponents": fit_scaling_exponents(results)}
+
+
+def fit_scaling_exponents(results):
+    """
+    Fits the scaling exponent of every stage on the synthetic networks.
+
+    For each directedness, density and stage, log(time) is fitted as a line of log(n), so the
+    slope is the exponent k of time ~ n^k. A single exponent against the number of edges
+    (over every synthetic network of a directedness) is also fitted.
+
+    Arguments:
+        results => The records of run_benchmark_suite.
+
+    Returns:
+        A list of dictionaries with the 'stage', 'directed', 'p' (None for the fit against
+        edges), 'variable' ('n' or 'num_edges'), 'exponent' and 'num_points' of every fit.
+    """
+
+    synthetic = [record for record in results if record["kind"] == "synthetic"]
+    exponents = []
+
+    def fit(stage, is_directed, p, variable, records):
+        points = [(record[variable], record["stages"][stage]["min"]) for record in records
+                  if stage in record["stages"] and record[variable] > 0 and record["stages"][stage]["min"] > 0]
+
+        # A slope needs at least two distinct values of the variable.
+        if len(set(x for x, _ in points)) < 2:
+            return
+
+        x, y = np.log(np.array(points, dtype=float)).T
+        exponents.append({"stage": stage, "directed": is_directed, "p": p, "variable": variable,
+                          "exponent": float(np.polyfit(x, y, 1)[0]), "num_points": len(points)})
+
+    for stage in BENCHMARK_STAGES:
+        for is_directed in sorted(set(record["directed"] for record in synthetic)):
+            records = [record for record in synthetic if record["directed"] == is_directed]
+            for p in sorted(set(record["p"] for record in records)):
+                fit(stage, is_directed, p, "n", [record for record in records if record["p"] == p])
+            fit(stage, is_directed, None, "num_edges", records)
+
+    return exponents
+
+
+def save_benchmark(results, path):
+    """
+    Writes benchmark results to a JSON file.
+    """
+
+    with open(path, "w") as benchmark_file:
+        json.dump(results, benchmark_file, indent=2, sort_keys=True)
+
+
+def load_benchmark(path):
+    """
+    Reads benchmark results from a JSON file.
+    """
+
+    with open(path) as benchmark_file:
+        return json.load(benchmark_file)
+
+
+def compare_benchmarks(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compares benchmark results against a saved baseline.
+
+    Stages are compared on their minimum time (the least noisy statistic), and a stage is
+    flagged as a regression when it is more than tolerance slower than the baseline (stages
+    faster than REGRESSION_MIN_SECONDS in both runs are never flagged).
+
+    Arguments:
+        results => The current results of run_benchmark_suite.
+        baseline => The baseline results of run_benchmark_suite.
+        tolerance => The relative slowdown allowed before flagging a regression.
+
+    Returns:
+        A list of dictionaries with the 'name', 'stage', 'baseline' and 'current' time, their
+        'ratio' and whether it is a 'regression', for every stage timed in both runs.
+    """
+
+    baseline_records = dict((record["name"], record) for record in baseline["results"])
+    comparisons = []
+
+    for record in results["results"]:
+        baseline_record = baseline_records.get(record["name"])
+        if baseline_record is None:
+            continue
+
+        for stage in BENCHMARK_STAGES:
+            if stage not in record["stages"] or stage not in baseline_record["stages"]:
+                continue
+
+            current_time = record["stages"][stage]["min"]
+            baseline_time = baseline_record["stages"][stage]["min"]
+            ratio = current_time / baseline_time if baseline_time > 0 else float("inf")
+            regression = (ratio > 1 + tolerance and
+                          max(current_time, baseline_time) >= REGRESSION_MIN_SECONDS)
+
+            comparisons.append({"name": record["name"], "stage": stage, "baseline": baseline_time,
+                                "current": current_time, "ratio": ratio, "regression": regression})
+
+    return comparisons
+
+
+def format_comparison(comparisons):
+    """
+    Builds a printable report of a benchmark comparison (see compare_benchmarks).
+    """
+
+    lines = []
+    for comparison in comparisons:
+        lines.append("{0:<45} {1:<10} {2:>10.5f} sec. -> {3:>10.5f} sec. ({4:>5.2f}x){5}".format(
+            comparison["name"], comparison["stage"], comparison["baseline"], comparison["current"],
+            comparison["ratio"], "  REGRESSION" if comparison["regression"] else ""))
+
+    num_regressions = sum(comparison["regression"] for comparison in comparisons)
+    lines.append("{0} regression(s) in {1} comparison(s).".format(num_regressions, len(comparisons)))
+
+    return "\n".join(lines)
+
+
+def main(args=None):
+    """
+    Runs the benchmark suite from the command line (run from the repository root so the
+    dataset paths resolve), e.g.:
+
+        python utils/time_complexity.py --datasets s208 yeast --output baseline.json
+        python utils/time_complexity.py --datasets s208 yeast --compare baseline.json
+
+    Returns:
+        The exit status (1 when a regression was found in compare mode).
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmarks the triad motif pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[100, 200, 400])
+    parser.add_argument("--densities", type=float, nargs="*", default=[0.02, 0.05])
+    parser.add_argument("--directed", choices=("both", "yes", "no"), default="both")
+    parser.add_argument("--datasets", nargs="*", default=[], choices=list(DATASETS.keys()))
+    parser.add_argument("--stages", nargs="*", default=list(BENCHMARK_STAGES), choices=BENCHMARK_STAGES)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--rand-instances", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="The JSON file the results are written to.")
+    parser.add_argument("--compare", help="A baseline JSON file to check the results against.")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args(args)
+
+    directed = {"both": (False, True), "yes": (True,), "no": (False,)}[args.directed]
+    results = run_benchmark_suite(sizes=args.sizes, densities=args.densities, directed=directed,
+                                  datasets=args.datasets, stages=args.stages,
+                                  num_iterations=args.iterations, num_rand_instances=args.rand_instances,
+                                  seed=args.seed)
+
+    if args.output:
+        save_benchmark(results, args.output)
+    else:
+        print(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.compare:
+        comparisons = compare_benchmarks(results, load_benchmark(args.compare), tolerance=args.tolerance)
+        print(format_comparison(comparisons))
+        return int(any(comparison["regression"] for comparison in comparisons))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,325 +4,863 @@ of an input network.
 """
 
 import networkx as nx
-import itertools
+import multiprocessing
+import time
 import numpy as np
-from itertools import combinations
-from networks import randomize
 
-
-def count_triad_motifs(network, directed=None):
+# SciPy is optional: without it the "auto" engine always falls back to the compact engine.
+try:
+    import scipy.sparse as sparse
+except ImportError:
+    sparse = None
+
+from networks import randomize_compact_graph
+from compact_graph import CompactGraph
+from profile_cache import SignificanceProfileCache
+from instrumentation import PipelineStats, timed_stage
+
+
+# Maps the 6-bit arc code of a node triplet a, b, c to its directed triad motif index (or -1
+# when the triplet is not connected). Bit 0 => a -> b, bit 1 => b -> a, bit 2 => a -> c,
+# bit 3 => c -> a, bit 4 => b -> c, bit 5 => c -> b. The motif indices are:
+# 0 => a <- b -> c
+# 1 => a -> b <- c
+# 2 => b -> a -> c
+# 3 => a -> b <-> c
+# 4 => c <-> a -> b
+# 5 => a <-> b <-> c
+# 6 => a <- b -> c <- a
+# 7 => a -> b -> c -> a
+# 8 => c <-> a -> b <- c
+# 9 => c <- a -> b <-> c
+# 10 => a <-> c -> b -> a
+# 11 => a <-> b <-> c -> a
+# 12 => a <-> b <-> c <-> a
+DIRECTED_TRIAD_MOTIF_TABLE = np.array([
+    -1, -1, -1, -1, -1,  0,  2,  4,  # codes 0-7
+    -1,  2,  1,  3, -1,  4,  3,  5,  # codes 8-15
+    -1,  2,  0,  4,  1,  6,  6,  8,  # codes 16-23
+     2,  7,  6, 10,  3, 10,  9, 11,  # codes 24-31
+    -1,  1,  2,  3,  2,  6,  7, 10,  # codes 32-39
+     0,  6,  6,  9,  4,  8, 10, 11,  # codes 40-47
+    -1,  3,  4,  5,  3,  9, 10, 11,  # codes 48-55
+     4, 10,  8, 11,  5, 11, 11, 12   # codes 56-63
+], dtype=np.int8)
+
+# The number of triplets classified at once by the compact counting engine.
+TRIAD_BATCH_SIZE = 65536
+
+# Networks with fewer edges are counted by the compact engine in "auto" mode (the sparse matrix
+# setup costs more than enumerating their few triads).
+MATRIX_ENGINE_MIN_EDGES = 1000
+
+# The number of degree-weighted node ranges per worker in parallel counting (more shards than
+# workers keeps every worker busy when some shards turn out slower than their weight).
+COUNT_SHARDS_PER_WORKER = 4
+
+# The default number of wedges drawn by the sampling engine.
+DEFAULT_NUM_WEDGE_SAMPLES = 100000
+
+# The largest number of wedges drawn by the sampling engine when targeting a relative error.
+MAX_NUM_WEDGE_SAMPLES = 10000000
+
+# The number of wedges contained in each directed triad motif (open triads have a single
+# center, closed triads have three) and in each undirected motif (triangle, then chain).
+DIRECTED_MOTIF_WEDGES = np.array([1, 1, 1, 1, 1, 1, 3, 3, 3, 3, 3, 3, 3])
+UNDIRECTED_MOTIF_WEDGES = np.array([3, 1])
+
+# The wedge types a node can center, indexed like the open directed motifs, by the kind of
+# link to each of its two neighbors:
+# 0 => out, out    1 => in, in    2 => out, in    3 => in, mutual    4 => out, mutual    5 => mutual, mutual
+NUM_WEDGE_TYPES = 6
+
+# The wedge types centered on the three nodes of every closed directed motif.
+CLOSED_MOTIF_WEDGE_TYPES = {
+    6: (0, 2, 1),
+    7: (2, 2, 2),
+    8: (4, 4, 1),
+    9: (0, 3, 3),
+    10: (4, 3, 2),
+    11: (5, 3, 4),
+    12: (5, 5, 5),
+}
+
+# The version of the counting and randomization algorithms. It is part of every cached
+# significance profile's key, so bump it whenever a change alters the profiles produced.
+TRIAD_MOTIF_ENGINE_VERSION = 1
+
+
+def count_triad_motifs(network, directed=None, engine="auto", stats=None, num_samples=None,
+                       target_relative_error=None, seed=None, per_node=False, num_workers=1):
     """
     Counts the occurences of triad motifs in a network.
 
     Arguments:
-        network => The input network.
+        network => The input network (a networkx graph or a CompactGraph).
         directed => Whether or not the network is directed.
+        engine => The counting engine ("compact" counts exactly on an array-backed CompactGraph
+        built once from the input, "sparse" counts undirected networks exactly with SciPy sparse
+        matrix products, "matrix" counts directed (and undirected) networks exactly with SciPy
+        sparse matrix products, "sampling" estimates the counts by wedge sampling, see
+        estimate_triad_motifs, and "auto" picks the fastest exact engine available).
+        stats => An optional PipelineStats recording the stage times and the number of
+        triplets examined.
+        num_samples, target_relative_error, seed => The options of the "sampling" engine (see
+        estimate_triad_motifs).
+        per_node => Whether to also count, for every node, the motif instances it takes part
+        in (only the "compact" engine enumerates the triads, so "auto" picks it).
+        num_workers => The number of worker processes enumerating the triads when the "compact"
+        engine is picked explicitly, each over its own shard of centers. The graph arrays are
+        shared with the workers and the counts are identical to a serial count. "auto" ignores
+        it, since its serial matrix engine beats a sharded enumeration.
 
     Returns:
         A fixed-size array with indices representing unique triad motifs and the values 
-        representing their number of occurences within the network.
+        representing their number of occurences within the network. When per_node is set, a
+        tuple (motif_counts, node_motif_counts) where row i of the N x 13 (or N x 2) array
+        node_motif_counts counts the motif instances node i takes part in.
     """
 
-    if directed or nx.is_directed(network):
+    if per_node and engine not in ("auto", "compact"):
+        raise ValueError("Per-node motif counts require the compact engine.")
 
-        # Initialize an array for storing our motif counts. Each index represents the following motif:
-        # 0 => a <- b -> c
-        # 1 => a -> b <- c
-        # 2 => b -> a -> c
-        # 3 => a -> b <-> c
-        # 4 => c <-> a -> b
-        # 5 => a <-> b <-> c
-        # 6 => a <- b -> c <- a
-        # 7 => a -> b -> c -> a
-        # 8 => c <-> a -> b <- c
-        # 9 => c <- a -> b <-> c
-        # 10 => a <-> c -> b -> a
-        # 11 => a <-> b <-> c -> a
-        # 12 => a <-> b <-> c <-> a
-        motif_counts = np.zeros(shape=(13,), dtype=np.int)
-    
-        # Store a set of visited node combinations so repeats don't occur.
-        visited_triplets = []
-
-        # Iterate through the valid edges.
-        for a, b in sorted(nx.edges_iter(network)):
-                                            
-            # Take all unique c nodes that form valid a, b, c triplets.
-            # By ensuring that all neighbors have node ID greater than b we prevent any unique
-            # node triplets from being repeated.
-            c_neighbors = set([neighbor for neighbor in
-                               itertools.chain(nx.all_neighbors(network, a), nx.all_neighbors(network, b))
-                               if neighbor != a and neighbor != b])
-
-            # Iterate through the valid a, b, c triplets.
-            for c in c_neighbors:
-
-                # Make sure unique node triplets aren't repeated.
-                sorted_abc = sorted((a, b, c))
-                if sorted_abc in visited_triplets:
-                    continue
-                else:
-                    visited_triplets.append(sorted_abc)
-            
-                # a <-------> b
-                # a     c     b
-                if network.has_edge(b, a):
-
-                    # a <-------> b
-                    # a --> c     b
-                    if network.has_edge(a, c):
-
-                        # a <-------> b
-                        # a <-> c     b
-                        if network.has_edge(c, a):
-
-                            # a <-------> b
-                            # a <-> c --> b
-                            if network.has_edge(c, b):
-
-                                # a <-------> b
-                                # a <-> c <-> b
-                                if network.has_edge(b, c):
-                                    motif_counts[12] += 1
-
-                                # a <-------> b
-                                # a <-> c --> b
-                                else:
-                                    motif_counts[11] += 1
-
-                            # a <-------> b
-                            # a <-> c <-- b
-                            elif network.has_edge(b, c):
-                                motif_counts[11] += 1
-
-                            # a <-------> b
-                            # a <-> c     b
-                            else:
-                                motif_counts[5] += 1
-
-                        # a <-------> b
-                        # a --> c     b 
-                        else:
-
-                            # a <-------> b
-                            # a --> c --> b
-                            if network.has_edge(c, b):
-
-                                # a <-------> b
-                                # a --> c <-> b
-                                if network.has_edge(b, c):
-                                    motif_counts[11] += 1
-
-                                # a <-------> b
-                                # a --> c --> b
-                                else:
-                                    motif_counts[10] += 1
-
-                            # a <-------> b
-                            # a --> c <-- b
-                            elif network.has_edge(b, c):
-                                motif_counts[8] += 1
-
-                            # a <-------> b
-                            # a --> c     b
-                            else:
-                                motif_counts[4] += 1
-
-                    # a <-------> b
-                    # a <-- c     b
-                    elif network.has_edge(c, a):
-
-                        # a <-------> b
-                        # a <-- c --> b
-                        if network.has_edge(c, b):
-
-                            # a <-------> b
-                            # a <-- c <-> b
-                            if network.has_edge(b, c):
-                                motif_counts[11] += 1
-
-                            # a <-------> b
-                            # a <-- c --> b
-                            else:
-                                motif_counts[9] += 1
-
-                        # a <-------> b
-                        # a <-- c <-- b
-                        elif network.has_edge(b, c):
-                            motif_counts[10] += 1
-
-                        # a <-------> b
-                        # a <-- c     b
-                        else:
-                            motif_counts[3] += 1
-
-                    # a <-------> b
-                    # a     c <-- b
-                    elif network.has_edge(b, c):
-
-                        # a <-------> b
-                        # a     c <-> b
-                        if network.has_edge(c, b):
-                            motif_counts[5] += 1
-
-                        # a <-------> b
-                        # a     c <-- b
-                        else:
-                            motif_counts[4] += 1
-
-                    # a <-------> b
-                    # a     c --> b
-                    else:
-                        motif_counts[3] += 1
-
-                # a --------> b
-                # a     c     b
-                else:
-
-                    # a --------> b
-                    # a --> c     b
-                    if network.has_edge(a, c):
-
-                        # a --------> b
-                        # a <-> c     b
-                        if network.has_edge(c, a):
-
-                            # a --------> b
-                            # a <-> c --> b
-                            if network.has_edge(c, b):
-
-                                # a --------> b
-                                # a <-> c <-> b
-                                if network.has_edge(b, c):
-                                    motif_counts[11] += 1
-
-                                # a --------> b
-                                # a <-> c --> b
-                                else:
-                                    motif_counts[8] += 1
-
-                            # a --------> b
-                            # a <-> c <-- b
-                            elif network.has_edge(b, c):
-                                motif_counts[10] += 1
-
-                            # a --------> b
-                            # a <-> c     b
-                            else:
-                                motif_counts[4] += 1
-
-                        # a --------> b
-                        # a --> c     b 
-                        else:
-
-                            # a --------> b
-                            # a --> c --> b 
-                            if network.has_edge(c, b):
-
-                                # a --------> b
-                                # a --> c <-> b 
-                                if network.has_edge(b, c):
-                                    motif_counts[9] += 1
-
-                                # a --------> b
-                                # a --> c --> b 
-                                else:
-                                    motif_counts[6] += 1
-
-                            # a --------> b
-                            # a --> c <-- b 
-                            elif network.has_edge(b, c):
-                                motif_counts[6] += 1
-
-                            # a --------> b
-                            # a --> c     b 
-                            else:
-                                motif_counts[0] += 1
-
-                    # a --------> b
-                    # a <-- c     b
-                    elif network.has_edge(c, a):
-
-                        # a --------> b
-                        # a <-- c --> b
-                        if network.has_edge(c, b):
-
-                            # a --------> b
-                            # a <-- c <-> b
-                            if network.has_edge(b, c):
-                                motif_counts[10] += 1
-
-                            # a --------> b
-                            # a <-- c --> b
-                            else:
-                                motif_counts[6] += 1
-
-                        # a --------> b
-                        # a <-- c <-- b
-                        elif network.has_edge(b, c):
-                            motif_counts[7] += 1
-
-                        # a --------> b
-                        # a <-- c     b
-                        else:
-                            motif_counts[2] += 1
-
-                    # a --------> b
-                    # a     c <-- b
-                    elif network.has_edge(b, c):
-
-                        # a --------> b
-                        # a     c <-> b
-                        if network.has_edge(c, b):
-                            motif_counts[3] += 1
-
-                        # a --------> b
-                        # a     c <-- b
-                        else:
-                            motif_counts[2] += 1
-
-                    # a --------> b
-                    # a     c --> b
-                    else:
-                        motif_counts[1] += 1
+    if engine == "sampling":
+        return estimate_triad_motifs(network, directed=directed, num_samples=num_samples,
+                                     target_relative_error=target_relative_error, seed=seed, stats=stats)[0]
+
+    if engine not in ("auto", "compact", "sparse", "matrix"):
+        raise ValueError("Unknown triad motif counting engine: {}".format(engine))
+
+    # Convert the input network once; everything after this works on the arrays.
+    if isinstance(network, CompactGraph):
+        graph = network
+    else:
+        with timed_stage(stats, "label_conversion"):
+            graph = CompactGraph.from_networkx(network)
+
+    directed = directed or graph.is_directed()
+
+    # Only an explicit request for the compact engine is sharded over worker processes.
+    sharded = engine == "compact" and num_workers > 1
+
+    if engine == "auto":
+        use_matrix = sparse is not None and graph.number_of_edges() >= MATRIX_ENGINE_MIN_EDGES and not per_node
+        engine = "matrix" if use_matrix else "compact"
+
+    with timed_stage(stats, "triad_counting"):
+        if engine == "matrix" and directed:
+            return _count_matrix_directed_triad_motifs(graph)
+
+        if engine in ("sparse", "matrix"):
+            return _count_sparse_undirected_triad_motifs(graph)
+
+        if sharded:
+            return _count_sharded_triad_motifs(graph, directed, num_workers, stats, per_node=per_node)
+
+        return _count_compact_triad_motifs(graph, directed, stats, per_node=per_node)
+
+
+def _count_compact_triad_motifs(graph, directed, stats=None, per_node=False, node_range=None):
+    """
+    Counts the occurences of triad motifs in a CompactGraph (see count_triad_motifs), optionally
+    only over the triads centered on a range of nodes (see _iter_connected_triads).
+    """
+
+    if directed or graph.is_directed():
+
+        # Initialize an array for storing our motif counts (see DIRECTED_TRIAD_MOTIF_TABLE
+        # for the motif each index represents).
+        motif_counts = np.zeros(shape=(13,), dtype=int)
+        node_counter = _NodeMotifCounter(graph.num_nodes, 13) if per_node else None
+
+        # Classify every batch of connected triads through the lookup table.
+        for centers, first, second in _iter_connected_triads(graph, node_range=node_range):
+            codes = _directed_triad_code(graph.has_edges, centers, first, second)
+            motifs = DIRECTED_TRIAD_MOTIF_TABLE[codes]
+            motif_counts += np.bincount(motifs, minlength=13)
+
+            if node_counter is not None:
+                node_counter.add(motifs, centers, first, second)
+
+            if stats is not None:
+                stats.increment("triplets_examined", len(centers))
 
     else:
 
         # Initialize an array for storing our motif counts. Each index represents the following motif:
         # 0 => a - b - c - a
         # 1 => a - b - c
-        motif_counts = np.zeros(shape=(2,), dtype=np.int)
-    
-        # Iterate through the edges in the network.
-        for a, b in sorted(nx.edges_iter(network)):
-            
-            # Find all node a neighbors such that their node ID is greater than node b (which, by the sorted 
-            # nature of nx.edges_iter, will always be greater than node a).
-            a_neighbors = set([neighbor for neighbor in network[a] if neighbor > b])
-
-            # Find all node b neighbors such that their node ID is greater than node b. The prevents repeated
-            # consideration of node triplets.
-            b_neighbors = set([neighbor for neighbor in network[b] if neighbor > b])
-            
-            # The number of triangle motifs is the number of common neighbors of a and b.
-            motif_counts[0] += len(a_neighbors.intersection(b_neighbors))
-            
-            # The number of chain motifs is the number of unshared neighbors or a and b.
-            motif_counts[1] += len(a_neighbors.symmetric_difference(b_neighbors))
-    
+        motif_counts = np.zeros(shape=(2,), dtype=int)
+        node_counter = _NodeMotifCounter(graph.num_nodes, 2) if per_node else None
+
+        # A triad is a triangle when the two neighbors of its center are linked.
+        for centers, first, second in _iter_connected_triads(graph, node_range=node_range):
+            closed = graph.are_linked(first, second)
+            num_closed = np.count_nonzero(closed)
+            motif_counts[0] += num_closed
+            motif_counts[1] += len(centers) - num_closed
+
+            if node_counter is not None:
+                node_counter.add(np.where(closed, 0, 1), centers, first, second)
+
+            if stats is not None:
+                stats.increment("triplets_examined", len(centers))
+
+    if node_counter is not None:
+        return motif_counts, node_counter.counts()
+
     return motif_counts
 
 
-def compute_normalized_triad_motif_z_scores(network, num_rand_instances=10, num_rewirings=None):
+def _count_sharded_triad_motifs(graph, directed, num_workers, stats=None, per_node=False):
+    """
+    Counts the triad motifs of a CompactGraph over several worker processes.
+
+    The graph arrays are copied once into shared memory, and the centers are split into
+    contiguous node ranges carrying roughly equal numbers of center-neighbor pairs (a node of
+    degree d centers C(d, 2) of them). Every triad is enumerated from exactly one center, so
+    the partial counts of the shards add up to the serial count.
+
+    Arguments:
+        graph => The input CompactGraph.
+        directed => Whether or not the graph is directed.
+        num_workers => The number of worker processes.
+        stats => An optional PipelineStats recording the number of triplets examined.
+        per_node => Whether to also return the per-node motif counts.
+
+    Returns:
+        The motif counts (and the per-node motif counts when per_node is set).
+    """
+
+    shards = _degree_weighted_node_ranges(graph, num_workers * COUNT_SHARDS_PER_WORKER)
+    tasks = [(start, stop, directed, per_node) for start, stop in shards]
+
+    pool = multiprocessing.Pool(min(num_workers, len(tasks)), initializer=_init_counting_worker,
+                                initargs=(graph.num_nodes, graph.directed, _share_arrays(graph.array_state())))
+    try:
+        results = pool.map(_count_triad_shard, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+    motif_counts = sum(shard_counts for shard_counts, _, _ in results)
+
+    if stats is not None:
+        stats.increment("triplets_examined", sum(num_triplets for _, _, num_triplets in results))
+
+    if per_node:
+        return motif_counts, sum(node_counts for _, node_counts, _ in results)
+
+    return motif_counts
+
+
+def _degree_weighted_node_ranges(graph, num_shards):
+    """
+    Splits the nodes into at most num_shards contiguous (start, stop) ranges centering roughly
+    equal numbers of center-neighbor pairs.
+    """
+
+    if graph.num_nodes == 0:
+        return [(0, 0)]
+
+    # Every node costs at least one unit, so long runs of leaves are split up too.
+    degrees = graph.degrees().astype(np.int64)
+    cumulative_work = np.cumsum(degrees * (degrees - 1) // 2 + 1)
+
+    cuts = np.searchsorted(cumulative_work, cumulative_work[-1] * np.arange(1, num_shards) / float(num_shards),
+                           side="right")
+    boundaries = np.unique(np.concatenate(([0], cuts, [graph.num_nodes])))
+
+    return list(zip(boundaries[:-1].tolist(), boundaries[1:].tolist()))
+
+
+def _share_arrays(arrays):
+    """
+    Copies arrays into shared memory blocks that worker processes can view without copying.
+
+    Returns:
+        A dictionary mapping each name to a tuple (block, dtype, size) (see _view_shared_arrays).
+    """
+
+    shared = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = multiprocessing.RawArray("b", max(array.nbytes, 1))
+        _view_shared_array(block, array.dtype.str, array.size)[:] = array
+        shared[name] = (block, array.dtype.str, array.size)
+
+    return shared
+
+
+def _view_shared_array(block, dtype, size):
+    return np.frombuffer(block, dtype=dtype, count=size) if size else np.zeros(0, dtype=dtype)
+
+
+# The CompactGraph counted by the current (worker) process.
+_worker_count_graph = None
+
+
+def _init_counting_worker(num_nodes, directed, shared):
+    """
+    Stores a view of the shared CompactGraph arrays in the current process.
+    """
+
+    global _worker_count_graph
+    arrays = dict((name, _view_shared_array(*block)) for name, block in shared.items())
+    _worker_count_graph = CompactGraph.from_array_state(num_nodes, directed, arrays)
+
+
+def _count_triad_shard(task):
+    """
+    Counts the triad motifs centered on one node range of the shared graph.
+
+    Arguments:
+        task => A tuple (start, stop, directed, per_node).
+
+    Returns:
+        A tuple (motif_counts, node_motif_counts, num_triplets) where node_motif_counts is None
+        unless per_node is set.
+    """
+
+    start, stop, directed, per_node = task
+    stats = PipelineStats()
+
+    result = _count_compact_triad_motifs(_worker_count_graph, directed, stats, per_node=per_node,
+                                         node_range=(start, stop))
+    motif_counts, node_counts = result if per_node else (result, None)
+
+    return motif_counts, node_counts, stats.counters.get("triplets_examined", 0)
+
+
+class _NodeMotifCounter(object):
+    """
+    Accumulates how many instances of each motif every node takes part in.
+
+    The counts live in one flat array indexed by node * num_motifs + motif. Batches of
+    (node, motif) keys are buffered and folded in with a single bincount whenever the buffer
+    holds as many keys as the array has slots, so each flush costs no more than the keys it
+    consumes and the total cost stays linear in the number of triads.
+    """
+
+    def __init__(self, num_nodes, num_motifs):
+        self.num_motifs = num_motifs
+        self._counts = np.zeros(num_nodes * num_motifs, dtype=np.int64)
+        self._pending = []
+        self._num_pending = 0
+
+    def add(self, motifs, *nodes):
+        """
+        Adds one instance of motifs[i] to each of the nodes nodes[0][i], nodes[1][i], ...
+        """
+
+        for node_array in nodes:
+            self._pending.append(node_array.astype(np.int64) * self.num_motifs + motifs)
+            self._num_pending += len(node_array)
+
+        if self._num_pending >= len(self._counts):
+            self._flush()
+
+    def counts(self):
+        """
+        Returns the N x num_motifs array of per-node motif counts.
+        """
+
+        self._flush()
+
+        return self._counts.reshape(-1, self.num_motifs)
+
+    def _flush(self):
+        if self._pending:
+            self._counts += np.bincount(np.concatenate(self._pending), minlength=len(self._counts))
+            self._pending = []
+            self._num_pending = 0
+
+
+def _count_sparse_undirected_triad_motifs(graph):
+    """
+    Counts the triangles and chains of an undirected CompactGraph with sparse matrix products.
+
+    With L the strictly lower triangular part of the adjacency matrix, (L @ L)[i, k] counts the
+    paths i > j > k, so summing it over the edges of L counts every triangle exactly once.
+    Every node of degree k centers C(k, 2) wedges, and each triangle closes three of them, so
+    the chains are the remaining sum(C(k, 2)) - 3T wedges.
+
+    Arguments:
+        graph => The input CompactGraph (undirected).
+
+    Returns:
+        The 2-slot motif count array (triangles, chains).
+    """
+
+    if sparse is None:
+        raise ImportError("The sparse triad motif counting engine requires SciPy.")
+
+    if graph.is_directed():
+        raise ValueError("The sparse triad motif counting engine only counts undirected networks.")
+
+    # The CSR arrays of the compact graph are already a valid sparse adjacency matrix.
+    adjacency = sparse.csr_matrix((np.ones(len(graph.out_indices), dtype=np.int64), graph.out_indices,
+                                   graph.out_indptr), shape=(graph.num_nodes, graph.num_nodes))
+    lower = sparse.tril(adjacency, k=-1, format="csr")
+
+    num_triangles = int(lower.dot(lower).multiply(lower).sum())
+
+    degrees = graph.degrees().astype(np.int64)
+    num_wedges = int(np.sum(degrees * (degrees - 1) // 2))
+
+    return np.array([num_triangles, num_wedges - 3 * num_triangles], dtype=int)
+
+
+def _count_matrix_directed_triad_motifs(graph):
+    """
+    Counts the 13 directed triad motifs of a CompactGraph with sparse matrix products.
+
+    The arcs are split into a symmetric matrix M of mutual dyads and a matrix A of single
+    (asymmetric) arcs. Each closed motif is then a masked product, e.g. sum((A @ A) o A) counts
+    the paths x -> y -> z closed by x -> z (motif 6) and sum((A @ A) o A^T) = trace(A^3) counts
+    every 3-cycle three times (motif 7). Open motifs follow from the degrees: a node with o
+    single out-, i single in- and m mutual links centers C(o, 2), C(i, 2), o * i, i * m, o * m
+    and C(m, 2) wedges of the open motifs 0 to 5, minus the wedges closed into triangles
+    (see CLOSED_MOTIF_WEDGE_TYPES).
+
+    Arguments:
+        graph => The input CompactGraph (directed).
+
+    Returns:
+        The 13-slot motif count array (see DIRECTED_TRIAD_MOTIF_TABLE).
+    """
+
+    if sparse is None:
+        raise ImportError("The matrix triad motif counting engine requires SciPy.")
+
+    shape = (graph.num_nodes, graph.num_nodes)
+    sources = np.repeat(np.arange(graph.num_nodes), np.diff(graph.out_indptr))
+    targets = graph.out_indices
+    mutual = graph.out_reciprocal
+
+    def arc_matrix(keep):
+        return sparse.csr_matrix((np.ones(np.count_nonzero(keep), dtype=np.int64),
+                                  (sources[keep], targets[keep])), shape=shape)
+
+    M = arc_matrix(mutual)
+    A = arc_matrix(~mutual)
+    AT = A.T.tocsr()
+
+    def masked_sum(product, mask):
+        return int(product.multiply(mask).sum())
+
+    motif_counts = np.zeros(shape=(13,), dtype=int)
+
+    # Closed motifs (every factor is a distinct structural role, so no triangle is counted twice
+    # except where the motif is symmetric, which the divisions account for).
+    AA = A.dot(A)
+    MM = M.dot(M)
+    motif_counts[6] = masked_sum(AA, A)
+    motif_counts[7] = masked_sum(AA, AT) // 3
+    motif_counts[8] = masked_sum(A.dot(AT), M) // 2
+    motif_counts[9] = masked_sum(AT.dot(A), M) // 2
+    motif_counts[10] = masked_sum(AA, M)
+    motif_counts[11] = masked_sum(MM, A)
+    motif_counts[12] = masked_sum(MM, M) // 6
+
+    # Open motifs: every wedge of a type, minus those closed into triangles.
+    _complete_open_triad_motif_counts(motif_counts, count_wedge_types(*graph.dyad_degrees()))
+
+    return motif_counts
+
+
+def count_wedge_types(single_out, single_in, mutual):
+    """
+    Counts the wedges of every type (see NUM_WEDGE_TYPES) centered on a set of nodes.
+
+    Arguments:
+        single_out, single_in, mutual => Arrays of the nodes' single-out, single-in and mutual
+        degrees (see CompactGraph.dyad_degrees).
+
+    Returns:
+        An integer array with the total number of wedges of each type.
+    """
+
+    single_out, single_in, mutual = [np.asarray(degrees, dtype=np.int64) for degrees in (single_out, single_in, mutual)]
+
+    return np.array([np.sum(single_out * (single_out - 1) // 2),
+                     np.sum(single_in * (single_in - 1) // 2),
+                     np.sum(single_out * single_in),
+                     np.sum(single_in * mutual),
+                     np.sum(single_out * mutual),
+                     np.sum(mutual * (mutual - 1) // 2)], dtype=np.int64)
+
+
+def _complete_open_triad_motif_counts(motif_counts, wedge_counts):
+    """
+    Fills in the open motif counts (0 to 5) of a 13-slot array whose closed motif counts (6 to
+    12) are known: every wedge of a type is an open motif unless a triangle closes it.
+    """
+
+    motif_counts[:NUM_WEDGE_TYPES] = wedge_counts
+
+    for motif, wedge_types in CLOSED_MOTIF_WEDGE_TYPES.items():
+        for wedge_type in wedge_types:
+            motif_counts[wedge_type] -= motif_counts[motif]
+
+    return motif_counts
+
+
+def _iter_connected_triads(graph, batch_size=None, node_range=None):
+    """
+    Enumerates every connected triad of a CompactGraph exactly once, in batches.
+
+    Every connected triad has a center: a node linked to both other nodes. Open triads
+    have exactly one center and closed triads (triangles) have three, so each triad is
+    emitted from its center, and triangles only from their smallest node. No visited
+    set is needed and the memory used is proportional to the graph plus one batch.
+
+    Arguments:
+        graph => The input CompactGraph.
+        batch_size => The approximate number of center-neighbor pairs examined per batch
+        (default set to TRIAD_BATCH_SIZE).
+        node_range => An optional (start, stop) range of the centers to enumerate (default set
+        to every node).
+
+    Returns:
+        A generator of (centers, first, second) node arrays such that each triad is made
+        of a center and two of its neighbors (first < second).
+    """
+
+    batch_size = batch_size or TRIAD_BATCH_SIZE
+
+    indptr = graph.neighbor_indptr
+    indices = graph.neighbor_indices
+    start_node, stop_node = node_range or (0, graph.num_nodes)
+    first_slot = indptr[start_node]
+    num_slots = indptr[stop_node] - first_slot
+
+    # Each neighbor slot pairs up with every later slot of the same center.
+    slot_centers = np.repeat(np.arange(start_node, stop_node, dtype=np.int32),
+                             np.diff(indptr[start_node:stop_node + 1]))
+    pair_counts = indptr[slot_centers.astype(np.int64) + 1] - np.arange(first_slot, first_slot + num_slots) - 1
+    pair_ends = np.cumsum(pair_counts)
+
+    # Split the slots into chunks of roughly batch_size pairs each.
+    num_pairs = pair_ends[-1] if num_slots else 0
+    boundaries = np.searchsorted(pair_ends, np.arange(batch_size, num_pairs, batch_size), side="right")
+    boundaries = np.unique(np.concatenate(([0], boundaries, [num_slots])))
+
+    for start, stop in zip(boundaries[:-1], boundaries[1:]):
+
+        # Expand the slot range into all of its center-neighbor-neighbor pairs.
+        counts = pair_counts[start:stop]
+        local_slots = np.repeat(np.arange(start, stop), counts)
+        offsets = np.arange(len(local_slots)) - np.repeat(np.cumsum(counts) - counts, counts)
+        first_slots = first_slot + local_slots
+        second_slots = first_slots + 1 + offsets
+
+        centers = slot_centers[local_slots]
+        first = indices[first_slots]
+        second = indices[second_slots]
+
+        # Keep open triads, and triangles only when the center is the smallest node.
+        keep = (centers < first) | ~graph.are_linked(first, second)
+
+        yield centers[keep], first[keep], second[keep]
+
+
+def _directed_triad_code(has_edge, a, b, c):
+    """
+    Encodes the arcs among the nodes a, b, c as a 6-bit code (see DIRECTED_TRIAD_MOTIF_TABLE).
+
+    Arguments:
+        has_edge => A function taking two nodes (or two arrays of nodes) that tests
+        whether the arcs exist.
+        a, b, c => The nodes (or arrays of nodes) of the triplets.
+
+    Returns:
+        The code of the triplet (or an array of codes).
+    """
+
+    return (has_edge(a, b) * 1 | has_edge(b, a) * 2 |
+            has_edge(a, c) * 4 | has_edge(c, a) * 8 |
+            has_edge(b, c) * 16 | has_edge(c, b) * 32)
+
+
+def estimate_triad_motifs(network, directed=None, num_samples=None, target_relative_error=None,
+                          max_samples=MAX_NUM_WEDGE_SAMPLES, seed=None, z_critical=1.96, stats=None):
+    """
+    Estimates the occurences of triad motifs in a network by uniform wedge sampling.
+
+    A wedge is a node (its center) with two of its neighbors, so the network has
+    W = sum(C(d, 2)) wedges where d is the number of nodes linked to each node. Every connected
+    triad contains one wedge when it is open and three when it is closed, so drawing wedges
+    uniformly and counting each motif with weight W / (number of wedges in the motif) gives
+    unbiased estimates of every count. The cost depends on the number of samples, not on the
+    size of the network (apart from an O(n) setup).
+
+    Arguments:
+        network => The input network (a networkx graph or a CompactGraph).
+        directed => Whether or not the network is directed.
+        num_samples => The number of wedges drawn (default set to DEFAULT_NUM_WEDGE_SAMPLES, or
+        to max_samples when a target_relative_error is given).
+        target_relative_error => Stops sampling early once the confidence interval half-width
+        of every observed motif is within this fraction of its estimate.
+        max_samples => The largest number of wedges drawn when targeting a relative error.
+        seed => A seed for the wedge sampling.
+        z_critical => The critical value of the confidence intervals (1.96 for 95%).
+        stats => An optional PipelineStats recording the stage times and the number of
+        triplets examined.
+
+    Returns:
+        A tuple (estimates, half_widths) of float arrays with the estimated motif counts and
+        the half-widths of their confidence intervals (motifs never drawn get the rule of three
+        upper bound instead).
+    """
+
+    if isinstance(network, CompactGraph):
+        graph = network
+    else:
+        with timed_stage(stats, "label_conversion"):
+            graph = CompactGraph.from_networkx(network)
+
+    directed = directed or graph.is_directed()
+    motif_wedges = DIRECTED_MOTIF_WEDGES if directed else UNDIRECTED_MOTIF_WEDGES
+
+    with timed_stage(stats, "triad_sampling"):
+
+        degrees = graph.degrees().astype(np.int64)
+        cumulative_wedges = np.cumsum(degrees * (degrees - 1) // 2)
+        num_wedges = int(cumulative_wedges[-1]) if len(cumulative_wedges) else 0
+
+        # Without wedges there are no connected triads at all.
+        if num_wedges == 0:
+            return np.zeros(len(motif_wedges)), np.zeros(len(motif_wedges))
+
+        if num_samples is None:
+            num_samples = max_samples if target_relative_error is not None else DEFAULT_NUM_WEDGE_SAMPLES
+
+        random = np.random.RandomState(seed)
+        hits = np.zeros(len(motif_wedges), dtype=np.int64)
+        num_drawn = 0
+
+        while num_drawn < num_samples:
+            batch_size = min(TRIAD_BATCH_SIZE, num_samples - num_drawn)
+            centers, first, second = _sample_wedges(graph, cumulative_wedges, batch_size, random)
+
+            if directed:
+                codes = _directed_triad_code(graph.has_edges, centers, first, second)
+                hits += np.bincount(DIRECTED_TRIAD_MOTIF_TABLE[codes], minlength=13)
+            else:
+                closed = np.count_nonzero(graph.are_linked(first, second))
+                hits += (closed, batch_size - closed)
+
+            num_drawn += batch_size
+
+            if target_relative_error is not None:
+                estimates, half_widths = _wedge_sample_estimates(hits, num_drawn, num_wedges, motif_wedges,
+                                                                 z_critical)
+                observed = hits > 0
+                if np.all(half_widths[observed] <= target_relative_error * estimates[observed]):
+                    break
+
+    if stats is not None:
+        stats.increment("triplets_examined", num_drawn)
+
+    return _wedge_sample_estimates(hits, num_drawn, num_wedges, motif_wedges, z_critical)
+
+
+def _sample_wedges(graph, cumulative_wedges, num_samples, random):
+    """
+    Draws wedges uniformly at random.
+
+    Arguments:
+        graph => The input CompactGraph.
+        cumulative_wedges => The cumulative sum of the number of wedges centered on each node.
+        num_samples => The number of wedges drawn.
+        random => The RandomState used.
+
+    Returns:
+        A tuple (centers, first, second) of node arrays.
+    """
+
+    # Pick the centers with probability proportional to their number of wedges.
+    draws = random.randint(0, cumulative_wedges[-1], size=num_samples).astype(np.int64)
+    centers = np.searchsorted(cumulative_wedges, draws, side="right")
+
+    # Pick two distinct neighbor slots of every center.
+    degrees = graph.neighbor_indptr[centers + 1] - graph.neighbor_indptr[centers]
+    first_slots = np.minimum((random.random_sample(num_samples) * degrees).astype(np.int64), degrees - 1)
+    second_slots = np.minimum((random.random_sample(num_samples) * (degrees - 1)).astype(np.int64), degrees - 2)
+    second_slots += second_slots >= first_slots
+
+    offsets = graph.neighbor_indptr[centers]
+
+    return centers, graph.neighbor_indices[offsets + first_slots], graph.neighbor_indices[offsets + second_slots]
+
+
+def _wedge_sample_estimates(hits, num_drawn, num_wedges, motif_wedges, z_critical):
+    """
+    Turns the number of wedges drawn from each motif into count estimates and confidence
+    interval half-widths (see estimate_triad_motifs).
+    """
+
+    scale = num_wedges / motif_wedges.astype(float)
+    fractions = hits / float(num_drawn)
+
+    estimates = scale * fractions
+    half_widths = z_critical * scale * np.sqrt(fractions * (1 - fractions) / num_drawn)
+
+    # A motif that was never drawn has a 95% upper bound of about 3 / num_drawn (rule of three).
+    half_widths[hits == 0] = scale[hits == 0] * 3.0 / num_drawn
+
+    return estimates, half_widths
+
+
+class IncrementalTriadMotifCounter(object):
+    """
+    Keeps the triad motif counts of a network up to date while an EdgeSwapEngine rewires it.
+
+    A swap only changes the triplets containing both endpoints of a removed or added
+    edge, so each update re-examines just the triplets formed by those four node pairs
+    and their neighbors instead of recounting the whole network. The arcs of those triplets
+    are looked up in the engine's edge set (with the swap undone on the fly for the state
+    before it), so an update only costs as much as the neighborhoods of the swapped nodes.
+
+    Attributes:
+        engine => The EdgeSwapEngine whose edges are tracked.
+        motif_counts => The current triad motif counts.
+    """
+
+    def __init__(self, engine):
+        """
+        Arguments:
+            engine => An EdgeSwapEngine (the counts start from its current edges).
+        """
+
+        self.engine = engine
+
+        # Count the motifs of the starting network once.
+        sources, targets = engine.edges()
+        graph = CompactGraph(engine.num_nodes, sources, targets, directed=engine.directed)
+        self.motif_counts = count_triad_motifs(graph)
+
+        # Keep the set of nodes linked to each node in either direction.
+        self._neighbors = [set(graph.neighbors(node).tolist()) for node in range(engine.num_nodes)]
+
+    def update(self, removed, added):
+        """
+        Updates the motif counts after a swap performed by the engine.
+
+        Arguments:
+            removed => The two edges removed by the swap.
+            added => The two edges added by the swap.
+
+        Returns:
+            The updated motif counts.
+        """
+
+        engine = self.engine
+
+        # Link the added pairs first so the neighbor sets cover both states.
+        for u, v in added:
+            self._neighbors[u].add(v)
+            self._neighbors[v].add(u)
+
+        # Collect every triplet containing a changed node pair, as the pair and a third node.
+        firsts, seconds, thirds = [], [], []
+        for u, v in list(removed) + list(added):
+            others = np.fromiter(self._neighbors[u] | self._neighbors[v], dtype=np.int64)
+            others = others[(others != u) & (others != v)]
+            firsts.append(np.full(len(others), min(u, v)))
+            seconds.append(np.full(len(others), max(u, v)))
+            thirds.append(others)
+        a, b, c = np.concatenate(firsts), np.concatenate(seconds), np.concatenate(thirds)
+
+        # Drop the triplets reached from more than one changed pair.
+        a, b, c = np.sort([a, b, c], axis=0)
+        num_nodes = engine.num_nodes
+        if num_nodes ** 3 < 2 ** 63:
+            _, first_rows = np.unique((a * num_nodes + b) * num_nodes + c, return_index=True)
+        else:
+            _, first_rows = np.unique(np.column_stack((a, b, c)), axis=0, return_index=True)
+        a, b, c = a[first_rows], b[first_rows], c[first_rows]
+
+        # The engine has already applied the swap, so the previous state is recovered by
+        # undoing it on the fly.
+        removed_keys = self._pair_keys(*np.array(removed, dtype=np.int64).T)
+        added_keys = self._pair_keys(*np.array(added, dtype=np.int64).T)
+
+        def had_edges(u, v):
+            keys = self._pair_keys(u, v)
+            return np.isin(keys, removed_keys) | (engine.has_edges(u, v) & ~np.isin(keys, added_keys))
+
+        # Subtract the motifs formed before the swap and add those formed after it.
+        before = self._classify(had_edges, a, b, c)
+        after = self._classify(engine.has_edges, a, b, c)
+
+        num_motifs = len(self.motif_counts)
+        self.motif_counts += (np.bincount(after[after >= 0], minlength=num_motifs) -
+                              np.bincount(before[before >= 0], minlength=num_motifs))
+
+        # Unlink the removed pairs that are no longer linked in either direction.
+        for u, v in removed:
+            if not engine.has_edge(u, v) and not engine.has_edge(v, u):
+                self._neighbors[u].discard(v)
+                self._neighbors[v].discard(u)
+
+        return self.motif_counts
+
+    def _pair_keys(self, u, v):
+        """
+        Encodes arrays of node pairs as integers (undirected pairs ignore orientation).
+        """
+
+        if not self.engine.directed:
+            u, v = np.minimum(u, v), np.maximum(u, v)
+
+        return u * self.engine.num_nodes + v
+
+    def _classify(self, has_edge, a, b, c):
+        """
+        Returns the motif index of every triplet a, b, c (or -1 when it isn't connected),
+        given as arrays of nodes, where has_edge tests arrays of arcs.
+        """
+
+        if self.engine.directed:
+            return DIRECTED_TRIAD_MOTIF_TABLE[_directed_triad_code(has_edge, a, b, c)]
+
+        num_links = has_edge(a, b).astype(int) + has_edge(a, c) + has_edge(b, c)
+
+        return np.where(num_links == 3, 0, np.where(num_links == 2, 1, -1))
+
+
+def compute_normalized_triad_motif_z_scores(network, num_rand_instances=10, num_rewirings=None,
+                                            seed=None, num_workers=1, target_ci_width=None,
+                                            time_budget=None, min_rand_instances=5, stats=None, engine="auto",
+                                            num_samples=None, target_relative_error=None, null_model="degree"):
     """
     Computes the normalized triad motif z-score for each connected non-isomorphic triadic subgraph
     in the input network.
 
     Arguments:
-        network => The input network (can be directed or undirected).
+        network => The input network (a networkx graph or a CompactGraph, directed or undirected).
         num_rand_instances => The number of randomly-rewired network instances used when computing
-        z-score values.
+        z-score values (the maximum number of instances in adaptive mode).
         num_rewirings => The number of edge rewirings performed when randomizing the network.
+        seed => A master seed from which each random instance's seed is derived.
+        num_workers => The number of worker processes randomizing and counting the instances
+        (the z-scores are identical for any number of workers).
+        target_ci_width => Enables adaptive mode: random instances are generated until the 95%
+        confidence interval of every motif z-score is narrower than this width.
+        time_budget => Enables adaptive mode: random instances are generated until this many
+        seconds have passed.
+        min_rand_instances => The minimum number of random instances used in adaptive mode.
+        stats => An optional PipelineStats recording the stage times and counters of the whole
+        run (including those of every random instance).
+        engine => The counting engine used for the network and every random instance ("sampling"
+        estimates the counts, so the sampling noise also enters the ensemble spread).
+        num_samples, target_relative_error => The options of the "sampling" engine (see
+        estimate_triad_motifs).
+        null_model => "degree" to randomize with plain edge swaps, or "dyad" to also preserve the
+        number of mutual dyads of every node (which keeps reciprocity-rich networks from
+        inflating the z-scores of the motifs with mutual dyads; see DyadSwapEngine).
 
     Returns:
         A fixed-size numpy array where each index corresponds to a predefined unique triad motif
@@ -330,32 +868,75 @@ def compute_normalized_triad_motif_z_scores(network, num_rand_instances=10, num_
         over- or underexpression of a triad motif in the network.
     """
 
+    # Convert the network once; every random instance starts from a snapshot of its edges.
+    if isinstance(network, CompactGraph):
+        graph = network
+    else:
+        with timed_stage(stats, "label_conversion"):
+            graph = CompactGraph.from_networkx(network)
+
     # Determine if the network is directed or not (store to avoid recalculation).
-    directed = nx.is_directed(network)
+    directed = graph.is_directed()
+
+    # Derive an independent, reproducible seed for every random instance (and one more for
+    # sampling the original network).
+    instance_seeds = derive_instance_seeds(seed, num_rand_instances + 1)
+    count_seed = instance_seeds.pop()
 
     # Count the number of occurences of each triad motif.
-    original_motif_counts = count_triad_motifs(network, directed=directed)
+    count_options = {"engine": engine, "num_samples": num_samples, "target_relative_error": target_relative_error}
+    original_motif_counts = count_triad_motifs(graph, directed=directed, stats=stats, seed=count_seed,
+                                               **count_options)
+
+    # Start the worker processes once for the whole ensemble.
+    pool = _open_randomization_pool(graph, num_workers, num_rand_instances)
+
+    try:
+
+        # In adaptive mode, stream the instances through running statistics and stop early.
+        if target_ci_width is not None or time_budget is not None:
+            with timed_stage(stats, "ensemble"):
+                rand_motif_stats = _stream_randomized_motif_statistics(graph, directed, num_rewirings,
+                                                                       instance_seeds, original_motif_counts,
+                                                                       pool=pool,
+                                                                       round_size=max(num_workers, 1),
+                                                                       target_ci_width=target_ci_width,
+                                                                       time_budget=time_budget,
+                                                                       min_rand_instances=min_rand_instances,
+                                                                       count_options=count_options,
+                                                                       null_model=null_model,
+                                                                       stats=stats)
 
-    # Initialize an array for storing motif counts in randomized instances.
-    rand_motif_counts = []
+            with timed_stage(stats, "z_scores"):
+                return rand_motif_stats.z_scores(original_motif_counts)
 
-    # Iterate through random instances.
-    for _ in range(num_rand_instances):
+        # Randomize and count every instance (in instance order, whichever process runs it).
+        with timed_stage(stats, "ensemble"):
+            rand_motif_counts = _map_randomized_motif_counts(graph, directed, num_rewirings, instance_seeds,
+                                                             pool=pool, count_options=count_options,
+                                                             null_model=null_model, stats=stats)
 
-        # Randomize the network.
-        rand_network = randomize(network, num_rewirings=num_rewirings)
+    finally:
+        _close_randomization_pool(pool)
 
-        # Store the number of occurences of each motif in the randomized instance.
-        rand_motif_counts.append(count_triad_motifs(rand_network, directed=directed))
+    with timed_stage(stats, "z_scores"):
 
-    # Stack the counts as an array.
-    rand_motif_counts = np.vstack(rand_motif_counts)
+        # Stack the counts as an array.
+        rand_motif_counts = np.vstack(rand_motif_counts)
 
-    # Divide the random motif counts by the number of instances to make them into average counts.
-    avg_rand_motif_counts = np.mean(rand_motif_counts, axis=0)
+        # Divide the random motif counts by the number of instances to make them into average counts.
+        avg_rand_motif_counts = np.mean(rand_motif_counts, axis=0)
 
-    # Compute the random motif standard deviation.
-    rand_motif_std_dev = np.std(rand_motif_counts, axis=0)
+        # Compute the random motif standard deviation.
+        rand_motif_std_dev = np.std(rand_motif_counts, axis=0)
+
+        return _compute_z_scores(original_motif_counts, avg_rand_motif_counts, rand_motif_std_dev)
+
+
+def _compute_z_scores(original_motif_counts, avg_rand_motif_counts, rand_motif_std_dev):
+    """
+    Computes motif z-scores from the original counts and the random instance statistics.
+    """
 
     # Compute the z-scores (ignoring division by 0 warnings and place the resulting NaNs/infs with 0s).
     with np.errstate(divide='ignore', invalid='ignore'):
@@ -366,7 +947,360 @@ def compute_normalized_triad_motif_z_scores(network, num_rand_instances=10, num_
     return motif_z_scores
 
 
-def extract_triad_motif_significance_profile(network, num_rand_instances=10, num_rewirings=None):
+class RunningMotifStatistics(object):
+    """
+    Streaming mean and variance of motif counts (Welford's algorithm).
+
+    Attributes:
+        num_instances => The number of motif count vectors seen so far.
+        mean => The running mean of every motif count.
+    """
+
+    def __init__(self, num_motifs):
+        """
+        Arguments:
+            num_motifs => The number of motifs (13 for directed networks, 2 for undirected ones).
+        """
+
+        self.num_instances = 0
+        self.mean = np.zeros(num_motifs)
+        self._sum_squared_deviations = np.zeros(num_motifs)
+
+    def update(self, motif_counts):
+        """
+        Adds the motif counts of one random instance.
+        """
+
+        self.num_instances += 1
+        delta = motif_counts - self.mean
+        self.mean += delta / self.num_instances
+        self._sum_squared_deviations += delta * (motif_counts - self.mean)
+
+    def std(self):
+        """
+        Returns the (population) standard deviation of every motif count.
+        """
+
+        if self.num_instances == 0:
+            return np.zeros_like(self.mean)
+
+        return np.sqrt(self._sum_squared_deviations / self.num_instances)
+
+    def z_scores(self, original_motif_counts):
+        """
+        Returns the z-scores of the original motif counts against the running statistics.
+        """
+
+        return _compute_z_scores(original_motif_counts, self.mean, self.std())
+
+    def z_score_ci_widths(self, original_motif_counts, z_critical=1.96):
+        """
+        Estimates the width of the confidence interval of every motif z-score.
+
+        Both the mean and the standard deviation are estimated from the instances, so the
+        standard error of a z-score z after n instances is about sqrt(1/n + z^2/(2n)).
+        Motifs whose count never varies have a z-score fixed at 0 and a width of 0.
+
+        Arguments:
+            original_motif_counts => The motif counts of the original network.
+            z_critical => The critical value of the confidence level (1.96 for 95%).
+
+        Returns:
+            An array with the confidence interval width of every motif z-score.
+        """
+
+        if self.num_instances < 2:
+            return np.full_like(self.mean, np.inf)
+
+        z_scores = self.z_scores(original_motif_counts)
+        standard_errors = np.sqrt((1.0 + z_scores ** 2 / 2.0) / self.num_instances)
+
+        return np.where(self.std() > 0, 2 * z_critical * standard_errors, 0.0)
+
+
+def _stream_randomized_motif_statistics(graph, directed, num_rewirings, instance_seeds, original_motif_counts,
+                                        pool=None, round_size=1, target_ci_width=None, time_budget=None,
+                                        min_rand_instances=5, count_options=None, null_model="degree", stats=None):
+    """
+    Generates random instances until every motif z-score is precise enough or a budget runs out.
+
+    Instances are produced in rounds (one instance per worker) but fed to the statistics one at
+    a time in seed order, so (without a time budget) the stopping point and the result don't
+    depend on the number of workers.
+
+    Arguments:
+        graph => The input CompactGraph.
+        directed => Whether or not the graph is directed.
+        num_rewirings => The number of edge rewirings performed when randomizing the graph.
+        instance_seeds => The seeds of all the instances that may be generated (the instance budget).
+        original_motif_counts => The motif counts of the original graph.
+        pool => A pool from _open_randomization_pool (or None to work in the current process).
+        round_size => The number of instances generated per round.
+        target_ci_width => The target confidence interval width of every z-score.
+        time_budget => The number of seconds after which no new round is started.
+        min_rand_instances => The minimum number of instances used.
+        count_options => The keyword arguments of count_triad_motifs used for every instance.
+        null_model => The null model preserved when randomizing (see randomize).
+        stats => An optional PipelineStats recording the stage times and counters of the instances.
+
+    Returns:
+        The RunningMotifStatistics of the generated instances.
+    """
+
+    rand_motif_stats = RunningMotifStatistics(len(original_motif_counts))
+    start_time = time.time()
+
+    for start in range(0, len(instance_seeds), round_size):
+
+        round_seeds = instance_seeds[start:start + round_size]
+        round_counts = _map_randomized_motif_counts(graph, directed, num_rewirings, round_seeds, pool=pool,
+                                                    count_options=count_options, null_model=null_model,
+                                                    stats=stats)
+
+        for motif_counts in round_counts:
+            rand_motif_stats.update(motif_counts)
+
+            if rand_motif_stats.num_instances < min_rand_instances or target_ci_width is None:
+                continue
+
+            if np.all(rand_motif_stats.z_score_ci_widths(original_motif_counts) < target_ci_width):
+                return rand_motif_stats
+
+        if time_budget is not None and time.time() - start_time >= time_budget:
+            break
+
+    return rand_motif_stats
+
+
+def sample_randomized_motif_counts(network, num_rand_instances=10, num_rewirings=None, seed=None,
+                                   num_workers=1):
+    """
+    Counts the triad motifs of the network and of an ensemble of its random instances.
+
+    Arguments:
+        network => The input network (can be directed or undirected).
+        num_rand_instances => The number of randomly-rewired network instances.
+        num_rewirings => The number of edge rewirings performed when randomizing the network.
+        seed => A master seed from which each random instance's seed is derived.
+        num_workers => The number of worker processes randomizing and counting the instances.
+
+    Returns:
+        A tuple (original_motif_counts, rand_motif_counts) where rand_motif_counts holds one
+        row of motif counts per random instance.
+    """
+
+    directed = nx.is_directed(network)
+    graph = CompactGraph.from_networkx(network)
+    original_motif_counts = count_triad_motifs(graph, directed=directed)
+    instance_seeds = derive_instance_seeds(seed, num_rand_instances)
+
+    pool = _open_randomization_pool(graph, num_workers, num_rand_instances)
+    try:
+        rand_motif_counts = _map_randomized_motif_counts(graph, directed, num_rewirings, instance_seeds,
+                                                         pool=pool)
+    finally:
+        _close_randomization_pool(pool)
+
+    return original_motif_counts, np.vstack(rand_motif_counts)
+
+
+def bootstrap_triad_motif_significance_profiles(network, num_runs=20, num_rand_instances=10, pool_size=None,
+                                                num_rewirings=None, seed=None, num_workers=1):
+    """
+    Computes several triad motif significance profiles of the input network from a single shared
+    ensemble of random instances.
+
+    Instead of building a fresh ensemble for every run, one pool of random instances is counted
+    once and every run resamples num_rand_instances members from it (with replacement), so the
+    cost is driven by the pool size rather than by the number of runs.
+
+    Arguments:
+        network => The input network (can be directed or undirected).
+        num_runs => The number of significance profiles to compute.
+        num_rand_instances => The number of random instances behind each profile.
+        pool_size => The number of random instances in the shared pool (default set to 5 times
+        num_rand_instances).
+        num_rewirings => The number of edge rewirings performed when randomizing the network.
+        seed => A master seed for the pool and the resampling.
+        num_workers => The number of worker processes used to build the pool.
+
+    Returns:
+        A numpy array with one significance profile (row of motif z-scores) per run.
+    """
+
+    pool_size = pool_size or 5 * num_rand_instances
+
+    # Draw the pool and the resampling from separate seeds derived from the master seed.
+    pool_seed, resample_seed = derive_instance_seeds(seed, 2)
+
+    original_motif_counts, rand_motif_counts = sample_randomized_motif_counts(network,
+                                                                              num_rand_instances=pool_size,
+                                                                              num_rewirings=num_rewirings,
+                                                                              seed=pool_seed,
+                                                                              num_workers=num_workers)
+
+    # Resample the members of every run from the pool at once.
+    members = np.random.RandomState(resample_seed).randint(0, pool_size, size=(num_runs, num_rand_instances))
+    run_motif_counts = rand_motif_counts[members]
+
+    return _compute_z_scores(original_motif_counts, np.mean(run_motif_counts, axis=1),
+                             np.std(run_motif_counts, axis=1))
+
+
+def derive_instance_seeds(seed, num_instances):
+    """
+    Derives one seed per random instance from a master seed.
+
+    Arguments:
+        seed => The master seed (None draws a fresh master seed).
+        num_instances => The number of seeds to derive.
+
+    Returns:
+        A list of integer seeds.
+    """
+
+    return np.random.RandomState(seed).randint(0, 2 ** 31 - 1, size=num_instances).tolist()
+
+
+def _map_randomized_motif_counts(graph, directed, num_rewirings, instance_seeds, pool=None, count_options=None,
+                                 null_model="degree", stats=None):
+    """
+    Randomizes the graph once per seed and counts the motifs of each random instance.
+
+    Arguments:
+        graph => The input CompactGraph.
+        directed => Whether or not the network is directed.
+        num_rewirings => The number of edge rewirings performed when randomizing the network.
+        instance_seeds => The seed of every random instance.
+        pool => A pool from _open_randomization_pool to spread the instances over (the
+        instances are processed in the current process when None).
+        count_options => The keyword arguments of count_triad_motifs used for every instance
+        (default set to exact counting).
+        null_model => The null model preserved when randomizing (see randomize).
+        stats => An optional PipelineStats recording the stage times and counters of the
+        instances (worker processes send theirs back along with the counts).
+
+    Returns:
+        A list with the motif counts of every random instance, in seed order.
+    """
+
+    tasks = [(directed, num_rewirings, instance_seed, count_options, null_model) for instance_seed in instance_seeds]
+
+    if pool is None:
+        return [_count_randomized_instance(graph, *task, stats=stats) for task in tasks]
+
+    results = pool.map(_randomized_motif_counts, [task + (stats is not None,) for task in tasks])
+
+    if stats is not None:
+        for _, instance_stats in results:
+            stats.merge(instance_stats)
+
+    return [motif_counts for motif_counts, _ in results]
+
+
+def _open_randomization_pool(graph, num_workers, num_instances):
+    """
+    Starts a pool of worker processes randomizing the graph (or returns None when a single
+    process is enough).
+
+    Arguments:
+        graph => The input CompactGraph.
+        num_workers => The requested number of worker processes.
+        num_instances => The maximum number of random instances that will be generated.
+
+    Returns:
+        A multiprocessing pool or None.
+    """
+
+    if num_workers <= 1 or num_instances <= 1:
+        return None
+
+    # Each worker receives the graph arrays once, then only the per-instance seeds are sent.
+    return multiprocessing.Pool(min(num_workers, num_instances), initializer=_init_randomization_worker,
+                                initargs=(graph,))
+
+
+def _close_randomization_pool(pool):
+    """
+    Shuts down a pool from _open_randomization_pool.
+    """
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+
+# The CompactGraph randomized by the current (worker) process.
+_worker_graph = None
+
+
+def _init_randomization_worker(graph):
+    """
+    Stores the CompactGraph randomized by the current process.
+    """
+
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _randomized_motif_counts(task):
+    """
+    Counts the motifs of one random instance of the graph stored in a worker process.
+
+    Arguments:
+        task => A tuple (directed, num_rewirings, seed, count_options, null_model, instrumented).
+
+    Returns:
+        A tuple (motif_counts, stats) where stats is the as_dict export of the instance's
+        PipelineStats (or None when not instrumented).
+    """
+
+    directed, num_rewirings, instance_seed, count_options, null_model, instrumented = task
+    stats = PipelineStats() if instrumented else None
+
+    motif_counts = _count_randomized_instance(_worker_graph, directed, num_rewirings, instance_seed,
+                                              count_options=count_options, null_model=null_model, stats=stats)
+
+    return motif_counts, stats.as_dict() if instrumented else None
+
+
+def _count_randomized_instance(graph, directed, num_rewirings, instance_seed, count_options=None, null_model="degree",
+                               stats=None):
+    """
+    Counts the motifs of one random instance of the graph.
+
+    Arguments:
+        graph => The original CompactGraph.
+        directed => Whether or not the graph is directed.
+        num_rewirings => The number of edge rewirings performed when randomizing the graph.
+        instance_seed => The seed of the random instance.
+        count_options => The keyword arguments of count_triad_motifs (default set to exact counting).
+        null_model => The null model preserved when randomizing (see randomize).
+        stats => An optional PipelineStats recording the stage times and counters.
+
+    Returns:
+        The motif counts of the random instance.
+    """
+
+    # Every instance is drawn from its own snapshot of the original edges.
+    rand_graph = randomize_compact_graph(graph, num_rewirings=num_rewirings, seed=instance_seed, stats=stats,
+                                         null_model=null_model)
+
+    # Sampling engines get their own seed, independent of the rewiring's.
+    count_seed = derive_instance_seeds(instance_seed, 1)[0]
+    motif_counts = count_triad_motifs(rand_graph, directed=directed, stats=stats, seed=count_seed,
+                                      **(count_options or {}))
+
+    if stats is not None:
+        stats.increment("ensemble_members")
+
+    return motif_counts
+
+
+def extract_triad_motif_significance_profile(network, num_rand_instances=10, num_rewirings=None,
+                                             seed=None, num_workers=1, target_ci_width=None, time_budget=None,
+                                             cache=None, stats=None, engine="auto", num_samples=None,
+                                             target_relative_error=None, null_model="degree"):
     """
     Computes the triad motif significance profile of the input network.
 
@@ -375,6 +1309,19 @@ def extract_triad_motif_significance_profile(network, num_rand_instances=10, num
         num_rand_instances => The number of randomly-rewired network instances used when computing
         z-score values.
         num_rewirings => The number of edge rewirings performed when randomizing the network.
+        seed => A master seed from which each random instance's seed is derived.
+        num_workers => The number of worker processes used to build the random instances.
+        target_ci_width => Enables adaptive mode (see compute_normalized_triad_motif_z_scores).
+        time_budget => Enables adaptive mode (see compute_normalized_triad_motif_z_scores).
+        cache => A SignificanceProfileCache (or True for one in the default directory) used to
+        reuse profiles computed before. Only reproducible runs (with a seed and no time budget)
+        are cached.
+        stats => An optional PipelineStats recording the stage times and counters (nothing is
+        recorded when the profile comes from the cache).
+        engine, num_samples, target_relative_error => The counting engine and its options (see
+        compute_normalized_triad_motif_z_scores).
+        null_model => The null model of the random instances (see
+        compute_normalized_triad_motif_z_scores).
 
     Returns:
         A fixed-size numpy array where each index corresponds to a predefined unique triad motif
@@ -382,13 +1329,49 @@ def extract_triad_motif_significance_profile(network, num_rand_instances=10, num
         over- or underexpression of a triad motif in the network.
     """
 
-    # Make sure the network labels are encoded as integer IDs (makes everything easier).
-    network = nx.convert_node_labels_to_integers(network)
+    if cache is True:
+        cache = SignificanceProfileCache()
+
+    # Unseeded or time-limited runs aren't reproducible, so their profiles aren't cached.
+    if seed is None or time_budget is not None:
+        cache = None
+
+    # The key covers the canonical edge set and everything else that determines the profile
+    # (the number of workers doesn't, since the results are identical for any worker count).
+    if cache is not None:
+        cache_key = cache.make_key(network,
+                                   num_rand_instances=num_rand_instances,
+                                   num_rewirings=num_rewirings,
+                                   seed=seed,
+                                   target_ci_width=target_ci_width,
+                                   engine=engine,
+                                   num_samples=num_samples,
+                                   target_relative_error=target_relative_error,
+                                   null_model=null_model,
+                                   engine_version=TRIAD_MOTIF_ENGINE_VERSION)
+        significance_profile = cache.get(cache_key)
+        if significance_profile is not None:
+            return significance_profile
+
+    # Encode the network labels as integer IDs (in the same canonical order the cache key uses).
+    with timed_stage(stats, "label_conversion"):
+        graph = CompactGraph.from_networkx(network)
 
     # Build an array of normalized motif expression z-scores (indices indicate unique motifs).
-    significance_profile = compute_normalized_triad_motif_z_scores(network, 
-                                                                   num_rand_instances=num_rand_instances, 
-                                                                   num_rewirings=num_rewirings)
+    significance_profile = compute_normalized_triad_motif_z_scores(graph,
+                                                                   num_rand_instances=num_rand_instances,
+                                                                   num_rewirings=num_rewirings,
+                                                                   seed=seed,
+                                                                   num_workers=num_workers,
+                                                                   target_ci_width=target_ci_width,
+                                                                   time_budget=time_budget,
+                                                                   stats=stats,
+                                                                   engine=engine,
+                                                                   num_samples=num_samples,
+                                                                   target_relative_error=target_relative_error,
+                                                                   null_model=null_model)
+
+    if cache is not None:
+        cache.put(cache_key, significance_profile)
 
     return significance_profile
-